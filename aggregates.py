@@ -0,0 +1,79 @@
+# src/aggregates.py
+import numpy as np
+import pandas as pd
+
+# Frequency ranges used by the Frequency Distribution pie chart
+FREQUENCY_RANGE_BINS = [0, 5, 20, 50, 100, np.inf]
+FREQUENCY_RANGE_LABELS = ['1-5', '6-20', '21-50', '51-100', '100+']
+
+
+def build_aggregates(index):
+    """
+    Compute every word-frequency aggregate the Textual Analysis page needs, once.
+
+    Returns a dict with:
+    - word_freq: unique words and frequencies, most frequent first
+    - freq_of_freq: how many words share each frequency, by frequency
+    - range_counts: number of words per frequency range, largest first
+    - summary: headline metrics for the statistics cards
+    """
+    word_freq = index.word_frequency_frame().reset_index(drop=True)
+
+    freq_of_freq = word_freq['Frequency'].value_counts().reset_index()
+    freq_of_freq.columns = ['Word Frequency', 'Count of Words with this Frequency']
+    freq_of_freq = freq_of_freq.sort_values('Word Frequency').reset_index(drop=True)
+
+    ranges = pd.cut(word_freq['Frequency'], bins=FREQUENCY_RANGE_BINS, labels=FREQUENCY_RANGE_LABELS)
+    range_counts = ranges.astype(str).value_counts()
+
+    summary = {
+        'unique_words': len(word_freq),
+        'total_occurrences': index.total_occurrences(),
+        'min_line': index.meta['first_line'],
+        'max_line': index.meta['last_line'],
+        'most_frequent_word': word_freq.iloc[0]['Word'] if len(word_freq) else '',
+        'most_frequent_count': int(word_freq.iloc[0]['Frequency']) if len(word_freq) else 0,
+    }
+
+    return {
+        'word_freq': word_freq,
+        'freq_of_freq': freq_of_freq,
+        'range_counts': range_counts,
+        'summary': summary,
+    }
+
+
+def build_line_prefix_sums(df):
+    """
+    Prefix sums of occurrence-row Frequency and of row counts over the line axis.
+    Entry i covers lines [0, i), so any line range's total is one subtraction.
+    """
+    lines = df['Line Number'].to_numpy(dtype=np.int64)
+    size = int(lines.max()) + 1 if len(lines) else 1
+    frequency = np.zeros(size + 1)
+    rows = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(lines, weights=df['Frequency'].to_numpy(dtype=float), minlength=size), out=frequency[1:])
+    np.cumsum(np.bincount(lines, minlength=size), out=rows[1:])
+    # Shared between sessions, so make accidental in-place edits fail loudly
+    frequency.flags.writeable = False
+    rows.flags.writeable = False
+    return {'frequency': frequency, 'rows': rows}
+
+
+def line_group_means(line_sums, bin_width):
+    """
+    Average Frequency per group of bin_width lines, from prefix sums in O(groups).
+    Groups without any occurrence rows are left out, as a groupby would.
+    """
+    frequency, rows = line_sums['frequency'], line_sums['rows']
+    n_lines = len(rows) - 1
+    edges = np.append(np.arange(0, n_lines, bin_width), n_lines)
+    starts, ends = edges[:-1], edges[1:]
+    counts = rows[ends] - rows[starts]
+    keep = counts > 0
+    line_groups = pd.DataFrame({
+        'Line Group': starts[keep],
+        'Frequency': (frequency[ends] - frequency[starts])[keep] / counts[keep],
+    })
+    line_groups['Line Range'] = [f"{x}-{x + bin_width - 1}" for x in line_groups['Line Group']]
+    return line_groups
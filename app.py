@@ -1,20 +1,19 @@
 # app.py (Main file)
 import streamlit as st
-import pandas as pd
 
-# Import all modules
+# Page modules (and the plotting/data libraries they pull in) are imported
+# lazily by the page registry below, so the landing page starts fast
 from config import set_page_config
-from data_loader import load_data, load_target_word_data
-from stats_section import display_stats_section
-from visualizations import display_visualizations
-from word_search import display_word_search
-from distribution_analysis import display_distribution_analysis
-from about_section import display_about_section
-from combined_analysis import display_combined_analysis_page
+from page_loader import import_page_module, load_dataset, mark, startup_report
+from spans import SPAN_STATS, begin_run, env_enabled, run_spans, span
 
 # Set page configuration
 set_page_config()
 
+# Span timings for this rerun, on with SGGK_TIMINGS set or ?timings in the URL
+show_timings = env_enabled() or 'timings' in st.query_params
+begin_run(show_timings)
+
 # Create a more visually appealing navigation menu
 st.sidebar.title("Navigation")
 
@@ -88,13 +87,14 @@ page = st.session_state['page']
 # Title (shown on all pages)
 st.title("Sir Gawain and the Green Knight: A Textual Analysis")
 
-# Load the data (needed for most pages)
-df = load_data()
-df_target = load_target_word_data() # NEW: Loads target_word_data.csv
+DATA_ERROR = "Could not load the data. Please ensure 'full-sggk.txt' or a built 'index/' directory is in the same directory as this script."
 
-# Display selected page
-if page == "Home":
-    
+def load_word_index():
+    """Load the word index the data pages share"""
+    data_loader = import_page_module('data_loader')
+    return load_dataset('word index', data_loader.load_word_index)
+
+def show_home():
     st.markdown("""
     ## Welcome!
     
@@ -115,7 +115,7 @@ if page == "Home":
             nav_to('Textual Analysis')
             st.rerun()
 
-elif page == "Textual Analysis":
+def show_textual_analysis():
     st.markdown("### Textual Visualization of Sir Gawain and the Green Knight")
     
     # Introduction
@@ -125,38 +125,88 @@ elif page == "Textual Analysis":
     patterns, frequencies, and distributions within this medieval masterpiece.
     """)
     
-    if df is not None:
+    index = load_word_index()
+    if index is not None:
+        data_loader = import_page_module('data_loader')
+        stats_section = import_page_module('stats_section')
+        visualizations = import_page_module('visualizations')
+        aggregates = load_dataset('aggregates', data_loader.load_aggregates, index, index.content_hash)
+
         # Display stats section
-        word_freq = display_stats_section(df)
+        word_freq = stats_section.display_stats_section(aggregates)
         
         # Display visualizations
-        display_visualizations(df)
+        line_sums = load_dataset('line prefix sums', data_loader.load_line_prefix_sums)
+        visualizations.display_visualizations(line_sums, aggregates)
     else:
-        st.error("Could not load the data. Please ensure 'word_occurrences.csv' is in the same directory as this script.")
+        st.error(DATA_ERROR)
 
-elif page == "Word Search":
+def show_word_search():
     st.markdown("### Word Search and Analysis")
     
-    if df is not None:
-        # Pass both dataframes to display_word_search
-        display_word_search(df, df_target) # MODIFIED CALL
+    index = load_word_index()
+    if index is not None:
+        data_loader = import_page_module('data_loader')
+        word_search = import_page_module('word_search')
+        df_target = load_dataset('target words', data_loader.load_target_word_data)
+        # Pass the word index and target dataframe to display_word_search
+        word_search.display_word_search(index, df_target)
     else:
-        st.error("Could not load the data. Please ensure 'word_occurrences.csv' is in the same directory as this script.")
+        st.error(DATA_ERROR)
 
-elif page == "Distribution Analysis":
+def show_distribution_analysis():
     st.markdown("### Distribution Analysis")
     
-    if df is not None:
-        display_distribution_analysis()
+    if load_word_index() is not None:
+        distribution_analysis = import_page_module('distribution_analysis')
+        distribution_analysis.display_distribution_analysis()
     else:
-        st.error("Could not load the data. Please ensure 'word_occurrences.csv' is in the same directory as this script.")
+        st.error(DATA_ERROR)
 
-elif page == "Combined Analysis":
-    display_combined_analysis_page()
+def show_combined_analysis():
+    combined_analysis = import_page_module('combined_analysis')
+    combined_analysis.display_combined_analysis_page()
 
-elif page == "About":
+def show_about():
     st.markdown("### About This Project")
-    display_about_section()
+    about_section = import_page_module('about_section')
+    about_section.display_about_section()
+
+# Page registry: each page imports its modules and loads its data only when first shown
+PAGES = {
+    "Home": show_home,
+    "Textual Analysis": show_textual_analysis,
+    "Word Search": show_word_search,
+    "Distribution Analysis": show_distribution_analysis,
+    "Combined Analysis": show_combined_analysis,
+    "About": show_about,
+}
+
+# Display selected page
+with span(f"page {page}"):
+    PAGES[page]()
+mark(f"first render ({page})")
+
+# Timing panel: this rerun's spans, rolling percentiles per span and the startup steps
+if show_timings:
+    with st.sidebar.expander("⏱ Timings", expanded=False):
+        spans = run_spans()
+        st.markdown("**This rerun**")
+        st.table({'Span': ['\u2003' * depth + name for depth, name, _ in spans],
+                  'ms': [round(ms, 1) for _, _, ms in spans]})
+        st.markdown("**Recent reruns (all sessions)**")
+        st.dataframe([{key: row[key] for key in ('span', 'calls', 'p50_ms', 'p95_ms')}
+                      for row in SPAN_STATS.summary()], hide_index=True, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSON", SPAN_STATS.to_json(), "timings.json", "application/json",
+                               use_container_width=True)
+        with col2:
+            st.download_button("Prometheus", SPAN_STATS.to_prometheus(), "timings.prom", "text/plain",
+                               use_container_width=True)
+        st.markdown("**Startup**")
+        st.table({'Step': [step for step, _ in startup_report()],
+                  'ms': [ms for _, ms in startup_report()]})
 
 # Footer (shown on all pages)
 st.markdown("---")
@@ -0,0 +1,195 @@
+# src/benchmark.py
+"""
+Benchmark the app's hot paths outside Streamlit on synthetic corpora scaled
+from full-sggk.txt, and record the timings as JSON.
+
+    python benchmark.py                          # 1x, 10x and 100x
+    python benchmark.py --scales 1 10 -o before.json
+    python benchmark.py --compare before.json    # print speedups against an earlier run
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from distribution_analysis import find_fitt_positions
+from ingest import ingest
+from inverted_index import WordIndex, build_index
+from lexicon_registry import LexiconRegistry
+from lexicon_matcher import find_category_hits
+from token_stream import FITT_END_MARKERS, encode_text
+from word_classifier import classify_frame
+
+SOURCE_TEXT = 'full-sggk.txt'
+LEXICON_FILE = 'tableConvert.com_9xq76i.csv'
+RESULTS_FILE = 'bench_results.json'
+
+SEARCH_TERMS = ['knyȝt', 'þe', 'luf', '"gawayn"']
+# Share of tokens in each extra copy of the text that become new spellings,
+# so vocabulary keeps growing with corpus size instead of staying fixed
+VARIANT_RATE = 0.2
+
+
+def copy_suffix(copy):
+    """Letters-only suffix marking a copy, so every tokenizer keeps it inside the word"""
+    letters = ''
+    while True:
+        copy, rem = divmod(copy, 26)
+        letters = string.ascii_lowercase[rem] + letters
+        if copy == 0:
+            return letters
+
+
+def make_corpus(scale, work_dir, seed=0):
+    """Write a text and lexicon scale times the size of the originals and return their paths"""
+    rng = random.Random(seed)
+    with open(SOURCE_TEXT, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    out_lines = []
+    for copy in range(scale):
+        suffix = copy_suffix(copy)
+        for line in lines:
+            if copy == 0:
+                out_lines.append(line)
+            else:
+                out_lines.append(' '.join(
+                    word + suffix if rng.random() < VARIANT_RATE else word for word in line.split(' ')
+                ))
+    text_path = os.path.join(work_dir, f'corpus-{scale}x.txt')
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out_lines) + '\n')
+
+    lexicon = pd.read_csv(LEXICON_FILE)
+    copies = []
+    for copy in range(scale):
+        rows = lexicon.copy()
+        if copy:
+            rows['Word'] = rows['Word'] + copy_suffix(copy)
+            rows['Line Number'] = rows['Line Number'] + copy * len(lines)
+        copies.append(rows)
+    lexicon_path = os.path.join(work_dir, f'lexicon-{scale}x.csv')
+    pd.concat(copies, ignore_index=True).to_csv(lexicon_path, index=False)
+    return text_path, lexicon_path
+
+
+def time_call(func, repeats):
+    """Run func repeats times and return (min, median) wall time in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), statistics.median(timings)
+
+
+def run_scale(scale, work_dir, repeats):
+    """Time every hot path on one corpus scale"""
+    text_path, lexicon_path = make_corpus(scale, work_dir)
+    index_dir = os.path.join(work_dir, f'index-{scale}x')
+    occurrences_path = os.path.join(work_dir, f'occurrences-{scale}x.parquet')
+
+    with open(text_path, 'r', encoding='utf-8') as f:
+        raw_text = f.read()
+    text = raw_text.lower()
+    lexicon = pd.read_csv(lexicon_path)
+    words = set(lexicon['Word'].str.lower())
+    results = []
+
+    def record(name, func, n=repeats):
+        best, median = time_call(func, n)
+        results.append({'scale': scale, 'benchmark': name, 'repeats': n,
+                        'min_ms': round(best, 3), 'median_ms': round(median, 3)})
+        print(f"  {scale:>4}x  {name:<28} min {best:10.2f} ms   median {median:10.2f} ms")
+
+    # Build steps run once per scale; they are offline jobs, not per-rerun work
+    record('build_index', lambda: build_index(text_path, index_dir), 1)
+    record('ingest', lambda: ingest([text_path], occurrences_path, workers=2), 1)
+
+    # load_data: startup cost of opening the index and reading the occurrence table
+    record('open_index', lambda: WordIndex(index_dir))
+    record('load_occurrences', lambda: pd.read_parquet(occurrences_path))
+
+    index = WordIndex(index_dir)
+
+    def search_page():
+        for term in SEARCH_TERMS:
+            exact = term.startswith('"') and term.endswith('"')
+            word_ids = index.match_words(term.strip('"'), exact=exact)
+            index.occurrence_count(word_ids)
+            index.occurrences_page(word_ids, 0, 50)
+    record('word_search_page', search_page)
+
+    record('encode_text', lambda: encode_text(text))
+    stream = encode_text(text)
+    lexicons = {'ChatGPT': words, 'Claude': words, 'Grok': words}
+    record('lexicon_registry', lambda: LexiconRegistry(stream.vocab, lexicons))
+    registry = LexiconRegistry(stream.vocab, lexicons)
+    record('get_positions', lambda: registry.positions(stream))
+    record('find_fitt_positions', lambda: find_fitt_positions(text, FITT_END_MARKERS, stream))
+
+    categories = {'Religious': 'Religious', 'Emotion-Related': 'Emotion-Related'}
+    lines = raw_text.splitlines()
+    record('combined_timeline', lambda: find_category_hits(lexicon, lines, categories))
+
+    # Full-vocabulary occurrence table with line text, as classify_words would read it
+    occurrences = index.occurrences_frame(range(len(index)))
+    record('classify_words', lambda: classify_frame(occurrences), min(repeats, 3))
+
+    for result in results:
+        result['tokens'] = len(stream)
+        result['vocabulary'] = len(index)
+    return results
+
+
+def compare(results, baseline_path):
+    """Print the speedup of each benchmark against an earlier results file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['scale'], r['benchmark']): r for r in json.load(f)['results']}
+    print(f"\nAgainst {baseline_path} (median, >1 means faster now):")
+    for result in results:
+        before = baseline.get((result['scale'], result['benchmark']))
+        if before and result['median_ms'] > 0:
+            print(f"  {result['scale']:>4}x  {result['benchmark']:<28} "
+                  f"{before['median_ms'] / result['median_ms']:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot paths on scaled synthetic corpora.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help="corpus sizes as multiples of full-sggk.txt (default: 1 10 100)")
+    parser.add_argument('--repeats', type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument('-o', '--output', default=RESULTS_FILE, help=f"results JSON (default: {RESULTS_FILE})")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in args.scales:
+            results.extend(run_scale(scale, work_dir, args.repeats))
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
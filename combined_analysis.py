@@ -1,8 +1,19 @@
 # combined_analysis.py
 import streamlit as st
 import pandas as pd
-import re
 import matplotlib.pyplot as plt
+from lexicon_matcher import find_category_hits
+from spans import span, timed
+
+@timed()
+@st.cache_data
+def get_timeline_hits(csv_df, text_content):
+    """
+    Match all lexicon words against the text in one pass.
+    Cached on the lexicon and text contents, so reruns skip the scan entirely.
+    """
+    categories = {'Religious': 'Religious', 'Emotion-Related': 'Emotion-Related'}
+    return find_category_hits(csv_df, text_content.splitlines(), categories)
 
 def display_combined_analysis_page():
     """
@@ -47,25 +58,11 @@ def display_combined_analysis_page():
         st.error(f"Error reading text file: {e}")
         return
 
-    plot_data = []
+    plot_df = get_timeline_hits(csv_df, text_content)
 
-    for index, row in csv_df.iterrows():
-        word = str(row['Word']).lower()
-        is_religious = row['Religious'] == 1
-        is_emotion_related = row['Emotion-Related'] == 1
-
-        for i, line in enumerate(text_content.splitlines()):
-            if re.search(r'\b' + re.escape(word) + r'\b', line.lower()):
-                if is_religious:
-                    plot_data.append({'line_number': i + 1, 'category': 'Religious'})
-                if is_emotion_related:
-                    plot_data.append({'line_number': i + 1, 'category': 'Emotion-Related'})
-
-    if not plot_data:
+    if plot_df.empty:
         st.warning("No relevant word occurrences found for plotting based on the provided CSV and text files.")
     else:
-        plot_df = pd.DataFrame(plot_data)
-
         fig, ax = plt.subplots(figsize=(18, 6)) # Increased width for better Fitt visibility
 
         # Filter data for each category
@@ -114,7 +111,8 @@ def display_combined_analysis_page():
 
         plt.tight_layout() # Adjust layout to prevent labels from overlapping
 
-        st.pyplot(fig)
+        with span('matplotlib.timeline'):
+            st.pyplot(fig)
 
         st.markdown("""
         **Explanation:**
@@ -0,0 +1,110 @@
+# src/concordance.py
+import mmap
+import re
+
+import numpy as np
+
+# A raw token runs up to the next whitespace or '--', matching tokenize_line's split
+TOKEN_END = re.compile(r'\s|--')
+LINE_SEPARATOR = ' / '
+
+
+def line_start_offsets(data):
+    """Byte offset where each line of a UTF-8 text starts, plus the end of the text"""
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1)).astype(np.int64)
+    if starts[-1] != len(data):
+        starts = np.append(starts, len(data))
+    return starts
+
+
+class Concordance:
+    """
+    Keyword-in-context views sliced on demand from a memory-mapped text.
+
+    Occurrences are addressed by (line number, byte offset in line); line text is
+    decoded from the mapped file only when a window is asked for, so nothing
+    stores a copy of each line per occurrence.
+    """
+
+    def __init__(self, text_path, line_starts=None, in_memory=False):
+        self.text_path = text_path
+        with open(text_path, 'rb') as f:
+            if in_memory:
+                # For a file that may be edited in place, where a shrinking map would fault
+                self.data = f.read()
+            else:
+                # mmap cannot map an empty file
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) else b''
+        self.line_starts = line_start_offsets(self.data) if line_starts is None else line_starts
+
+    def __len__(self):
+        """Number of lines in the text"""
+        return len(self.line_starts) - 1
+
+    def line(self, line_number):
+        """Text of one (1-based) line, without its line break"""
+        start, end = self.line_starts[line_number - 1], self.line_starts[line_number]
+        return self.data[start:end].decode('utf-8').rstrip('\r\n')
+
+    def lines(self, line_number, width):
+        """Lines line_number - width to line_number + width, joined with ' / '"""
+        first = max(1, line_number - width)
+        last = min(len(self), line_number + width)
+        return LINE_SEPARATOR.join(self.line(n).strip() for n in range(first, last + 1))
+
+    def kwic(self, line_number, byte_offset, width):
+        """
+        Return (left, keyword, right) with up to width words either side of the token
+        starting at byte_offset, continuing into neighbouring lines when needed.
+        """
+        start = self.line_starts[line_number - 1]
+        line = self.data[start:self.line_starts[line_number]]
+        left = line[:byte_offset].decode('utf-8')
+        rest = line[byte_offset:].decode('utf-8').rstrip('\r\n')
+        end = TOKEN_END.search(rest)
+        keyword = rest[:end.start()] if end else rest
+        right = rest[len(keyword):]
+
+        # Words are collected nearest-first and appended, so a wide window stays linear
+        left_words = left.split()[::-1]
+        count = _word_count(left_words)
+        previous = line_number - 1
+        while count < width and previous >= 1:
+            words = self.line(previous).split()
+            left_words.append('/')
+            left_words.extend(reversed(words))
+            count += _word_count(words)
+            previous -= 1
+        right_words = right.split()
+        count = _word_count(right_words)
+        following = line_number + 1
+        while count < width and following <= len(self):
+            words = self.line(following).split()
+            right_words.append('/')
+            right_words.extend(words)
+            count += _word_count(words)
+            following += 1
+
+        left_words = _take_words(left_words, width)[::-1]
+        right_words = _take_words(right_words, width)
+        return ' '.join(left_words), keyword, ' '.join(right_words)
+
+
+def _word_count(words):
+    """Count words, ignoring the '/' line-break markers"""
+    return sum(1 for w in words if w != '/')
+
+
+def _take_words(words, width):
+    """Take words from the front until width real words are included, dropping a trailing marker"""
+    taken, count = [], 0
+    for word in words:
+        if count == width:
+            break
+        taken.append(word)
+        if word != '/':
+            count += 1
+    while taken and taken[-1] == '/':
+        taken.pop()
+    return taken
@@ -0,0 +1,148 @@
+# src/cooccurrence.py
+"""
+Word co-occurrence counts over a token stream, stored as a sparse symmetric
+matrix in CSR form (indptr / indices / counts arrays over token-stream vocabulary
+IDs), with PMI and log-likelihood collocate queries answered from row slices.
+"""
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from spans import timed
+
+MEASURES = ('pmi', 'log-likelihood')
+
+
+class CooccurrenceMatrix:
+    """Pair counts for every two tokens within a window of each other (or on the same line)"""
+
+    def __init__(self, vocab, indptr, indices, counts):
+        self.vocab = vocab
+        self.word_to_id = {word: i for i, word in enumerate(vocab)}
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        # The matrix is symmetric, so row sums are also column sums
+        self.marginals = np.bincount(np.repeat(np.arange(len(vocab)), np.diff(indptr)),
+                                     weights=counts, minlength=len(vocab))
+        self.total = float(counts.sum())
+
+    def row(self, word_id):
+        """(co-occurring word IDs, pair counts) for one word, as slices of the CSR arrays"""
+        start, stop = self.indptr[word_id], self.indptr[word_id + 1]
+        return self.indices[start:stop], self.counts[start:stop]
+
+    def scores(self, word_id, measure='pmi'):
+        """(co-occurring word IDs, pair counts, association scores) for one word"""
+        ids, counts = self.row(word_id)
+        counts = counts.astype(float)
+        row_total, col_totals = self.marginals[word_id], self.marginals[ids]
+        if measure == 'pmi':
+            return ids, counts, np.log2(counts * self.total / (row_total * col_totals))
+        # Dunning's log-likelihood (G²) over the 2x2 table of each pair
+        observed = np.stack([counts, row_total - counts, col_totals - counts,
+                             self.total - row_total - col_totals + counts])
+        expected = np.stack([row_total * col_totals, row_total * (self.total - col_totals),
+                             (self.total - row_total) * col_totals,
+                             (self.total - row_total) * (self.total - col_totals)]) / self.total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+        return ids, counts, 2 * terms.sum(axis=0)
+
+    @timed()
+    def collocates(self, word, measure='pmi', min_count=2, near=None, mask=None, top=25):
+        """
+        Top collocates of a word as a DataFrame. near keeps only words that also
+        co-occur with a second word ("what co-occurs with drede near god"), and mask
+        (boolean over vocabulary IDs) keeps only words in a lexicon.
+        """
+        word_id = self.word_to_id.get(word.lower())
+        if word_id is None:
+            return pd.DataFrame(columns=['Word', 'Count', 'Score'])
+        ids, counts, scores = self.scores(word_id, measure)
+        keep = (counts >= min_count) & (ids != word_id)
+        if mask is not None:
+            keep &= mask[ids]
+        columns = {}
+        if near is not None:
+            near_id = self.word_to_id.get(near.lower())
+            near_ids, near_counts = self.row(near_id) if near_id is not None else (ids[:0], counts[:0])
+            # Row indices are sorted, so membership in the other row is a binary search
+            slot = np.minimum(np.searchsorted(near_ids, ids), max(len(near_ids) - 1, 0))
+            found = (near_ids[slot] == ids) if len(near_ids) else np.zeros(len(ids), dtype=bool)
+            keep &= found & (ids != near_id)
+            columns[f'Count near {near.lower()}'] = near_counts[slot][keep] if len(near_ids) else []
+        order = np.argsort(-scores[keep], kind='stable')[:top]
+        result = pd.DataFrame({
+            'Word': [self.vocab[i] for i in ids[keep][order]],
+            'Count': counts[keep][order].astype(np.int64),
+            'Score': scores[keep][order],
+        })
+        for name, values in columns.items():
+            result[name] = np.asarray(values)[order].astype(np.int64)
+        return result
+
+
+def line_breaks(text):
+    """Character offset of every newline in a text"""
+    return np.fromiter((m.start() for m in re.finditer('\n', text)), dtype=np.int64)
+
+
+def token_line_numbers(text, starts, newlines=None):
+    """Line number (0-based) of every token, from its character offset"""
+    return np.searchsorted(line_breaks(text) if newlines is None else newlines, starts)
+
+
+@timed()
+def build_cooccurrence(stream, window=5, lines=None):
+    """
+    Count co-occurring token pairs into a CooccurrenceMatrix. Pairs are tokens at most
+    window apart; with lines (a line number per token), only pairs on the same line
+    count. Each offset is one vectorized step; pairs are packed into int64 keys and
+    counted with a single np.unique.
+    """
+    ids = np.asarray(stream.ids, dtype=np.int64)
+    size = len(stream.vocab)
+    keys = []
+    for offset in range(1, window + 1):
+        if offset >= len(ids):
+            break
+        left, right = ids[:-offset], ids[offset:]
+        if lines is not None:
+            same = lines[:-offset] == lines[offset:]
+            left, right = left[same], right[same]
+        keys.append(left * size + right)
+        keys.append(right * size + left)
+    keys, counts = np.unique(np.concatenate(keys) if keys else np.empty(0, dtype=np.int64),
+                             return_counts=True)
+    rows, indices = np.divmod(keys, size)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=size)))).astype(np.int64)
+    return CooccurrenceMatrix(stream.vocab, indptr, indices.astype(np.int32), counts.astype(np.int32))
+
+
+def open_cooccurrence(text, stream, window=5, same_line=False, cache_dir=None):
+    """
+    Return the co-occurrence matrix for a text, loading it from cache_dir when it was
+    built from the same text with the same scope, and building and saving it otherwise.
+    With same_line, window is ignored and pairs are any two tokens on one line.
+    """
+    lines = token_line_numbers(text, stream.starts) if same_line else None
+    if same_line:
+        window = int(np.bincount(lines).max()) - 1 if len(lines) else 0
+    if cache_dir is None:
+        return build_cooccurrence(stream, window, lines)
+
+    sha1 = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, f"cooccurrence_{'line' if same_line else f'window{window}'}.npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            if str(cached['sha1']) == sha1:
+                return CooccurrenceMatrix(stream.vocab, cached['indptr'], cached['indices'], cached['counts'])
+
+    matrix = build_cooccurrence(stream, window, lines)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(path, sha1=sha1, indptr=matrix.indptr, indices=matrix.indices, counts=matrix.counts)
+    return matrix
@@ -1,30 +1,109 @@
 # src/data_loader.py
 import streamlit as st
 import pandas as pd
+import os
 import re
+from aggregates import build_aggregates, build_line_prefix_sums
+from cooccurrence import open_cooccurrence
+from frame_memory import compact_frame, freeze_frame
+from ingest import OCCURRENCES_FILE
+from inverted_index import INDEX_DIR, index_version, open_index
+from lexical_diversity import fitt_diversity, rolling_diversity
+from lexicon_registry import LexiconRegistry, read_theme_lexicons
+from spans import timed
+from token_stream import fitt_boundaries, open_token_stream
+from word_laws import fitt_word_laws, word_law_curves
 
-@st.cache_data
+def data_version():
+    """Changes whenever the index or the occurrence table is rebuilt or updated on disk"""
+    table = os.stat(OCCURRENCES_FILE).st_mtime_ns if os.path.exists(OCCURRENCES_FILE) else None
+    return index_version(), table
+
+@timed()
+def load_word_index():
+    """Memory-map the prebuilt inverted index, reopening it after a rebuild or reindex.py update"""
+    return _open_word_index(data_version()[0])
+
+@st.cache_resource
+def _open_word_index(version):
+    """Open the index at one on-disk version, building it first if it is missing"""
+    try:
+        return open_index()
+    except Exception as e:
+        st.error(f"Error loading word index: {str(e)}")
+        return None
+
+@timed()
+@st.cache_resource
+def load_aggregates(_index, content_hash):
+    """
+    Build the word-frequency aggregates once and share them across sessions.
+    content_hash (the index's) is the cache key, so a rebuilt index gets fresh aggregates.
+    """
+    try:
+        return build_aggregates(_index)
+    except Exception as e:
+        st.error(f"Error computing aggregates: {str(e)}")
+        return None
+
+@timed()
 def load_data():
-    """Load and process the CSV data with forward fill"""
-    try:
-        # Read the CSV
-        df = pd.read_csv('word_occurrences.csv')
-        
-        # Forward fill missing values
-        df['Word'] = df['Word'].fillna(method='ffill')
-        df['Frequency'] = df['Frequency'].fillna(method='ffill')
-        
-        # Remove any remaining null values
-        df = df.dropna(subset=['Word', 'Frequency', 'Line Number'])
-        
-        return df
+    """
+    Load the ingested word occurrence table, or expand the word index if it is missing.
+    Rows hold (line, byte offset) rather than line text; see concordance.Concordance.
+    Every caller gets its own shallow copy of one shared frame whose buffers are
+    read-only, so edits on a page copy the data first (or fail) instead of leaking
+    into other sessions.
+    """
+    df = _load_data(data_version())
+    return None if df is None else df.copy(deep=False)
+
+@st.cache_resource
+def _load_data(version):
+    """Occurrence table at one on-disk version of the index and table"""
+    try:
+        if os.path.exists(OCCURRENCES_FILE):
+            return freeze_frame(compact_frame(pd.read_parquet(OCCURRENCES_FILE)))
+
+        index = load_word_index()
+        if index is None:
+            return None
+        return freeze_frame(index.occurrence_table())
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-@st.cache_data
+@timed()
+def load_line_prefix_sums():
+    """Prefix sums of the occurrence table over the line axis, for line-position charts"""
+    line_sums = _load_line_prefix_sums(data_version())
+    # The arrays are read-only; copying the dict keeps key reassignment per caller too
+    return None if line_sums is None else dict(line_sums)
+
+@st.cache_resource
+def _load_line_prefix_sums(version):
+    """Prefix sums at one on-disk version of the index and table"""
+    df = load_data()
+    if df is None:
+        return None
+    return build_line_prefix_sums(df)
+
+def text_version(filepath):
+    """(mtime, size) of a text file, so loaders derived from it refresh after an edit; None if missing"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@timed()
 def load_text_file(filepath='full-sggk.txt'):
     """Load the full text file"""
+    return _load_text_file(filepath, text_version(filepath))
+
+@st.cache_data
+def _load_text_file(filepath, version):
+    """Lowercased text at one on-disk version"""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             text = f.read().lower()
@@ -33,6 +112,102 @@ def load_text_file(filepath='full-sggk.txt'):
         st.error(f"Error loading text file: {str(e)}")
         return None
     
+@timed()
+def load_token_stream(filepath='full-sggk.txt'):
+    """Encode the text once as a token-ID array, memory-mapped from the index directory"""
+    return _load_token_stream(filepath, text_version(filepath))
+
+@st.cache_resource
+def _load_token_stream(filepath, version):
+    """Token stream of the text at one on-disk version"""
+    text = load_text_file(filepath)
+    if text is None:
+        return None
+    try:
+        return open_token_stream(text, cache_dir=INDEX_DIR)
+    except Exception as e:
+        st.error(f"Error encoding text file: {str(e)}")
+        return None
+
+@timed()
+def load_lexical_diversity(filepath='full-sggk.txt', window=500):
+    """Per-fitt diversity measures and the rolling TTR curve, computed once per text and window"""
+    return _load_lexical_diversity(filepath, window, text_version(filepath))
+
+@st.cache_data
+def _load_lexical_diversity(filepath, window, version):
+    """Diversity measures for the text at one on-disk version"""
+    text = load_text_file(filepath)
+    stream = load_token_stream(filepath)
+    if text is None or stream is None:
+        return None, None
+    try:
+        ids = stream.ids
+        return fitt_diversity(ids, fitt_boundaries(text, stream)), rolling_diversity(ids, window)
+    except Exception as e:
+        st.error(f"Error computing lexical diversity: {str(e)}")
+        return None, None
+
+@timed()
+def load_cooccurrence(window=5, same_line=False, filepath='full-sggk.txt'):
+    """Co-occurrence matrix for the text, cached on disk in the index directory per window or line scope"""
+    return _load_cooccurrence(window, same_line, filepath, text_version(filepath))
+
+@st.cache_resource
+def _load_cooccurrence(window, same_line, filepath, version):
+    """Co-occurrence matrix for the text at one on-disk version"""
+    text = load_text_file(filepath)
+    stream = load_token_stream(filepath)
+    if text is None or stream is None:
+        return None
+    try:
+        return open_cooccurrence(text, stream, window, same_line, cache_dir=INDEX_DIR)
+    except Exception as e:
+        st.error(f"Error building co-occurrence matrix: {str(e)}")
+        return None
+
+@timed()
+def load_word_laws(filepath='full-sggk.txt'):
+    """Per-fitt Zipf and Heaps fits and the whole-poem curves, computed once per text"""
+    return _load_word_laws(filepath, text_version(filepath))
+
+@st.cache_data
+def _load_word_laws(filepath, version):
+    """Zipf and Heaps fits for the text at one on-disk version"""
+    text = load_text_file(filepath)
+    stream = load_token_stream(filepath)
+    if text is None or stream is None:
+        return None, None, None
+    try:
+        zipf, heaps = word_law_curves(stream.ids)
+        return fitt_word_laws(stream.ids, fitt_boundaries(text, stream)), zipf, heaps
+    except Exception as e:
+        st.error(f"Error fitting Zipf and Heaps laws: {str(e)}")
+        return None, None, None
+
+@timed()
+def load_lexicon_registry(theme, filepath='full-sggk.txt'):
+    """
+    Model lexicons for a theme matched to the text's vocabulary. Files are read through a
+    process-wide cache that re-reads them only when they change on disk, and the registry
+    is rebuilt only when their content hashes do.
+    """
+    stream = load_token_stream(filepath)
+    if stream is None:
+        return None
+    try:
+        lexicons, version = read_theme_lexicons(theme)
+    except Exception as e:
+        st.error(f"Error loading theme data: {str(e)}")
+        return None
+    return _build_lexicon_registry(theme, version, filepath, text_version(filepath), lexicons)
+
+@st.cache_resource
+def _build_lexicon_registry(theme, version, filepath, text_stamp, _lexicons):
+    """Match lexicons to the vocabulary; (theme, version, filepath, text_stamp) is the cache key"""
+    return LexiconRegistry(load_token_stream(filepath).vocab, _lexicons)
+
+@timed()
 @st.cache_data
 def load_target_word_data():
     """Load target word data from CSV."""
@@ -41,7 +216,8 @@ def load_target_word_data():
         # Strip whitespace from column names
         df.columns = df.columns.str.strip() # <--- ADD THIS LINE
         df['Word'] = df['Word'].str.lower() # Ensure words are lowercase for consistency
-        return df
+        # Categorical words and int32 numbers keep the per-call cache copy small
+        return compact_frame(df)
     except Exception as e:
         st.error(f"Error loading target_word_data.csv: {str(e)}")
         return pd.DataFrame() # Return empty DataFrame on error
\ No newline at end of file
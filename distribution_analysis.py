@@ -1,46 +1,103 @@
 # src/distribution_analysis.py
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
-import re
-from data_loader import load_text_file
-
-
-def load_target_word_data():
-    """Load target word data from CSV."""
-    try:
-        df = pd.read_csv('target_word_data.csv')
-        df['Word'] = df['Word'].str.lower() # Ensure words are lowercase for consistency
-        return df
-    except Exception as e:
-        st.error(f"Error loading target_word_data.csv: {str(e)}")
-        return pd.DataFrame() # Return empty DataFrame on error
-
-def get_target_word_distribution_traces(df_target_words, tokens, total_tokens, fitt_positions):
+from itertools import combinations
+import numpy as np
+from data_loader import (load_cooccurrence, load_lexicon_registry, load_target_word_data,
+                         load_text_file, load_token_stream)
+from export import EXPORT_FORMATS, POSITION_COLUMNS, export_bytes, position_chunks
+from spans import span, timed
+from token_stream import FITT_END_MARKERS, encode_text
+
+
+# Occurrence strips have no more horizontal pixels than this, so past it
+# occurrences are binned and each occupied bin is drawn once
+MAX_STRIP_SEGMENTS = 2000
+# Above this many segments the strip is drawn with WebGL instead of SVG
+WEBGL_SEGMENT_THRESHOLD = 500
+
+def get_occurrence_strip_trace(positions, y_low, y_high, color, max_segments=MAX_STRIP_SEGMENTS):
+    """
+    Packs every occurrence of one series into a single trace of vertical segments
+    separated by gaps, instead of one trace per occurrence.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if len(positions) > max_segments:
+        bins = np.unique(np.floor(positions * max_segments))
+        positions = (bins + 0.5) / max_segments
+
+    # Each segment is (x, y_low), (x, y_high), gap
+    x = np.repeat(positions, 3)
+    x[2::3] = np.nan
+    y = np.tile([y_low, y_high, np.nan], len(positions))
+
+    scatter = go.Scattergl if len(positions) > WEBGL_SEGMENT_THRESHOLD else go.Scatter
+    return scatter(
+        x=x,
+        y=y,
+        mode='lines',
+        line=dict(color=color, width=0.7),
+        showlegend=False,
+        hoverinfo='skip'
+    )
+
+# Density mode bins positions at these resolutions; each level is 4x the previous
+# so coarser levels are sums of the finest one
+DENSITY_LEVELS = (64, 256, 1024, 4096)
+# Aim for at least this many bins across the visible position range
+VISIBLE_DENSITY_BINS = 64
+PLOT_STYLES = ["Occurrence lines", "Density heatmap"]
+
+@timed()
+@st.cache_data
+def density_pyramid(positions, levels=DENSITY_LEVELS):
+    """
+    Counts of positions per bin at every resolution in levels: one bincount at the finest
+    level, and each coarser level by summing groups of adjacent bins. Cached, so changing
+    the visible range only selects a level.
+    """
+    finest = levels[-1]
+    bins = np.minimum((np.asarray(positions, dtype=float) * finest).astype(np.int64), finest - 1)
+    counts = np.bincount(bins, minlength=finest)
+    return {level: counts.reshape(level, -1).sum(axis=1) for level in levels}
+
+def pick_density_level(x_range, levels=DENSITY_LEVELS, visible_bins=VISIBLE_DENSITY_BINS):
+    """Coarsest level that still puts visible_bins bins across the visible range"""
+    width = max(x_range[1] - x_range[0], 1e-9)
+    return next((level for level in levels if level * width >= visible_bins), levels[-1])
+
+def get_density_heatmap_trace(rows, total_tokens, x_range):
+    """
+    One heatmap row per series, read from each series' pyramid at the level that suits
+    x_range. rows is a list of (y, positions); values are hits per 1,000 tokens.
+    """
+    level = pick_density_level(x_range)
+    first = int(np.floor(x_range[0] * level))
+    last = int(np.ceil(x_range[1] * level))
+    tokens_per_bin = max(total_tokens, 1) / level
+    z = [density_pyramid(positions)[level][first:last] * 1000 / tokens_per_bin for _, positions in rows]
+    return go.Heatmap(
+        x=(np.arange(first, last) + 0.5) / level,
+        y=[y for y, _ in rows],
+        z=z,
+        colorscale='Greens',
+        colorbar=dict(title="Hits per<br>1,000 words", len=0.8),
+        hovertemplate=f'Position %{{x:.3f}} (±{0.5 / level:.4f})<br>%{{z:.1f}} hits per 1,000 words<extra></extra>'
+    )
+
+def get_target_word_distribution_traces(df_target_words, stream, fitt_positions, style=PLOT_STYLES[0], x_range=(0, 1)):
     """
     Generates Plotly traces for the distribution of words from target_word_data.csv.
     Returns a list of traces, not a full figure.
     """
     traces = []
-    target_words_set = set(df_target_words['Word'].unique())
-    positions = []
+    positions = stream.positions(stream.lexicon_mask(df_target_words['Word'].unique()))
 
-    for index, token in enumerate(tokens):
-        relative_position = index / total_tokens
-        if token in target_words_set:
-            positions.append(relative_position)
-
-    if positions:
-        # Add vertical lines for each word occurrence
-        for pos in positions:
-            traces.append(go.Scatter(
-                x=[pos, pos],
-                y=[0.7, 1.3], # Adjust y-position as needed for a single line
-                mode='lines',
-                line=dict(color="green", width=0.7), # A distinct color for target words
-                showlegend=False,
-                hoverinfo='skip'
-            ))
+    if len(positions) and style == "Density heatmap":
+        traces.append(get_density_heatmap_trace([(1, positions)], len(stream), x_range))
+    elif len(positions):
+        # Add one packed trace of vertical lines for all word occurrences
+        traces.append(get_occurrence_strip_trace(positions, 0.7, 1.3, "green"))
 
         # Add legend entry for target words
         traces.append(go.Scatter(
@@ -52,11 +109,12 @@ def get_target_word_distribution_traces(df_target_words, tokens, total_tokens, f
         ))
     return traces
 
-def create_target_word_distribution_plot(df_target_words, tokens, total_tokens, fitt_positions):
+@timed()
+def create_target_word_distribution_plot(df_target_words, stream, fitt_positions, style=PLOT_STYLES[0], x_range=(0, 1)):
     """Create and display the distribution plot for words from target_word_data.csv"""
     fig = go.Figure()
     
-    traces = get_target_word_distribution_traces(df_target_words, tokens, total_tokens, fitt_positions)
+    traces = get_target_word_distribution_traces(df_target_words, stream, fitt_positions, style, x_range)
     for trace in traces:
         fig.add_trace(trace)
 
@@ -83,7 +141,7 @@ def create_target_word_distribution_plot(df_target_words, tokens, total_tokens,
             ticktext=['Target Words'],
             range=[0.5, 1.5] # Adjust range for a single line
         ),
-        xaxis=dict(range=[0, 1]),
+        xaxis=dict(range=list(x_range)),
         showlegend=True,
         legend=dict(
             orientation="h",
@@ -100,35 +158,37 @@ def create_target_word_distribution_plot(df_target_words, tokens, total_tokens,
     st.markdown("""
     This visualization shows the distribution of a predefined list of specific words from `target_word_data.csv` throughout the text.
     """)
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.target_word_distribution'):
+        st.plotly_chart(fig, use_container_width=True)
 
 
-def get_ai_model_distribution_traces(positions_chatgpt, positions_claude, positions_grok, y_offset=0):
+# Strip colours per model; models without an entry take the next fallback colour
+MODEL_COLORS = {"ChatGPT": "#1EE196", "Claude": "#1ECBE1", "Grok": "#1E6AE1"}
+FALLBACK_COLORS = ["#1EA3E1", "#7A1EE1", "#E11E9B", "#E1861E"]
+
+def get_model_colors(models):
+    """Colour for each model, in order"""
+    fallback = iter(FALLBACK_COLORS * len(models))
+    return [MODEL_COLORS.get(model) or next(fallback) for model in models]
+
+def get_ai_model_distribution_traces(model_positions, y_offset=0):
     """
-    Generates Plotly traces for AI model word distributions.
-    Returns a list of traces, not a full figure.
+    Generates Plotly traces for AI model word distributions, one strip per model
+    (first model at the top). Returns a list of traces, not a full figure.
     The y_offset allows shifting the traces vertically if combined with other plots.
     """
     traces = []
+    models = list(model_positions)
     ai_models = [
-        ("ChatGPT", positions_chatgpt, "#1EE196", 3),
-        ("Claude", positions_claude, "#1ECBE1", 2),
-        ("Grok", positions_grok, "#1E6AE1", 1)
+        (model, model_positions[model], color, len(models) - i)
+        for i, (model, color) in enumerate(zip(models, get_model_colors(models)))
     ]
     
     for model_name, positions, color, y_pos_base in ai_models:
         y_pos = y_pos_base + y_offset # Apply offset
-        if positions:
-            # Add vertical lines for each word occurrence
-            for pos in positions:
-                traces.append(go.Scatter(
-                    x=[pos, pos],
-                    y=[y_pos - 0.3, y_pos + 0.3],
-                    mode='lines',
-                    line=dict(color=color, width=0.7),
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
+        if len(positions):
+            # Add one packed trace of vertical lines for all word occurrences
+            traces.append(get_occurrence_strip_trace(positions, y_pos - 0.3, y_pos + 0.3, color))
             
             # Add legend entry
             traces.append(go.Scatter(
@@ -140,12 +200,18 @@ def get_ai_model_distribution_traces(positions_chatgpt, positions_claude, positi
             ))
     return traces
 
-def create_distribution_plot(positions_chatgpt, positions_claude, positions_grok, 
-                           fitt_positions, theme):
+@timed()
+def create_distribution_plot(model_positions, fitt_positions, theme, style=PLOT_STYLES[0], x_range=(0, 1), total_tokens=1):
     """Create and display the distribution plot"""
     fig = go.Figure()
+    models = list(model_positions)
     
-    traces = get_ai_model_distribution_traces(positions_chatgpt, positions_claude, positions_grok)
+    if style == "Density heatmap":
+        # Rows sit at the same y values as the strips (first model at the top)
+        rows = [(len(models) - i, model_positions[model]) for i, model in enumerate(models)]
+        traces = [get_density_heatmap_trace(rows, total_tokens, x_range)]
+    else:
+        traces = get_ai_model_distribution_traces(model_positions)
     for trace in traces:
         fig.add_trace(trace)
     
@@ -168,11 +234,11 @@ def create_distribution_plot(positions_chatgpt, positions_claude, positions_grok
         yaxis_title="",
         yaxis=dict(
             tickmode='array',
-            tickvals=[1, 2, 3],
-            ticktext=['Grok', 'Claude', 'ChatGPT'],
-            range=[0.5, 3.5]
+            tickvals=list(range(1, len(models) + 1)),
+            ticktext=models[::-1],
+            range=[0.5, len(models) + 0.5]
         ),
-        xaxis=dict(range=[0, 1]),
+        xaxis=dict(range=list(x_range)),
         showlegend=True,
         legend=dict(
             orientation="h",
@@ -181,10 +247,11 @@ def create_distribution_plot(positions_chatgpt, positions_claude, positions_grok
             xanchor="center",
             x=0.5
         ),
-        height=400
+        height=max(400, 100 * len(models) + 100)
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.model_distribution'):
+        st.plotly_chart(fig, use_container_width=True)
 
 def display_distribution_analysis():
     """Display the word distribution analysis section"""
@@ -199,20 +266,10 @@ def display_distribution_analysis():
     
     # Load the full text
     text = load_text_file()
+    stream = load_token_stream()
     
-    if text is not None:
-        tokens = re.findall(r"[a-zþȝ]+", text)
-        total_tokens = len(tokens)
-        
-        # Define fitt boundaries
-        fitt_end_markers = [
-            "Þat þou hatz tan on honde.",
-            "Cowþe wel halde layk alofte.",
-            "I schal telle yow how þay wroȝt.",
-            "HONY SOYT QUI MAL PENCE."
-        ]
-        
-        fitt_positions = find_fitt_positions(text, fitt_end_markers)
+    if text is not None and stream is not None:
+        fitt_positions = find_fitt_positions(text, FITT_END_MARKERS, stream)
         
         # Theme selection
         theme = st.selectbox(
@@ -234,94 +291,110 @@ def display_distribution_analysis():
             woven throughout this medieval narrative.
             """)
         
-        # Load words for selected theme
-        words_chatgpt, words_claude, words_grok = read_csv_by_theme(theme)
+        col1, col2 = st.columns(2)
+        with col1:
+            style = st.radio("Plot style:", PLOT_STYLES, horizontal=True, key="distribution_style")
+        with col2:
+            x_range = st.slider("Position range:", 0.0, 1.0, (0.0, 1.0), step=0.01, key="distribution_range")
+        if x_range[1] <= x_range[0]:
+            x_range = (0.0, 1.0)
+        
+        # Load words for selected theme, matched to the text's vocabulary (cached)
+        registry = load_lexicon_registry(theme)
         
-        if words_chatgpt or words_claude or words_grok:
+        if registry is not None and registry.membership.any():
             # Get positions
-            positions_chatgpt, positions_claude, positions_grok = get_positions(
-                words_chatgpt, words_claude, words_grok, tokens, total_tokens
-            )
+            model_positions = registry.positions(stream)
             
             # Create and display the plot
-            create_distribution_plot(positions_chatgpt, positions_claude, positions_grok, 
-                                   fitt_positions, theme)
+            create_distribution_plot(model_positions, fitt_positions, theme, style, x_range, len(stream))
             
             # Display statistics
-            display_distribution_stats(positions_chatgpt, positions_claude, positions_grok)
+            display_distribution_stats(model_positions)
+            display_positions_export(registry, stream, text, theme)
             
             # Display overlap analysis
-            display_overlap_analysis(words_chatgpt, words_claude, words_grok)
+            display_overlap_analysis(registry)
+
+            display_collocates(theme, registry.membership != 0)
         else:
             st.warning(f"No word data available for {theme} theme. Please check that the required CSV files exist.")
 
             # --- Add new visualization for target_word_data.csv ---
         df_target_words = load_target_word_data()
         if not df_target_words.empty:
-            create_target_word_distribution_plot(df_target_words, tokens, total_tokens, fitt_positions)
+            create_target_word_distribution_plot(df_target_words, stream, fitt_positions, style, x_range)
         else:
             st.warning("Could not load target word data. Specific target word distribution is unavailable.")
             
     else:
         st.warning("Could not load the text file. Distribution analysis is unavailable.")
 
-def find_fitt_positions(text, fitt_end_markers):
+# Co-occurrence scopes: (window in tokens, same line only)
+COLLOCATE_SCOPES = {
+    "±2 words": (2, False),
+    "±5 words": (5, False),
+    "±10 words": (10, False),
+    "Same line": (5, True),
+}
+COLLOCATE_MEASURES = {"PMI": 'pmi', "Log-likelihood": 'log-likelihood'}
+
+def display_collocates(theme, theme_mask):
+    """Display the words that co-occur most strongly with a chosen word"""
+    st.markdown("#### 🔗 Collocates")
+    st.markdown(f"""
+    Find the words that appear near a given word more often than chance. PMI favours rare, 
+    exclusive pairings; log-likelihood favours pairings that are both frequent and strong. 
+    Enter a second word to keep only collocates that also occur near it (e.g. *drede* near *god*), 
+    or limit results to the {theme.lower()} words identified by any model.
+    """)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        word = st.text_input("Word:", "drede", key="collocate_word")
+        scope = st.selectbox("Co-occurring within:", list(COLLOCATE_SCOPES), index=1, key="collocate_scope")
+        measure = st.radio("Measure:", list(COLLOCATE_MEASURES), horizontal=True, key="collocate_measure")
+    with col2:
+        near = st.text_input("Also near (optional):", "", key="collocate_near")
+        min_count = st.number_input("Minimum co-occurrences:", min_value=1, value=1, key="collocate_min_count")
+        lexicon_only = st.checkbox(f"Only {theme.lower()} words", key="collocate_lexicon_only")
+
+    if not word.strip():
+        return
+    window, same_line = COLLOCATE_SCOPES[scope]
+    matrix = load_cooccurrence(window, same_line)
+    if matrix is None:
+        return
+    collocates = matrix.collocates(
+        word.strip(),
+        measure=COLLOCATE_MEASURES[measure],
+        min_count=min_count,
+        near=near.strip() or None,
+        mask=theme_mask if lexicon_only else None,
+    )
+    if collocates.empty:
+        st.warning(f"No collocates found for '{word.strip()}'.")
+    else:
+        st.dataframe(collocates.style.format({'Score': '{:.2f}'}), use_container_width=True, hide_index=True)
+
+@timed()
+def find_fitt_positions(text, fitt_end_markers, stream=None):
     """Find the normalized positions of fitt endings in the text."""
     fitt_positions = []
+    text_lower = text.lower()
+    if stream is None:
+        stream = encode_text(text_lower)
     
     for marker in fitt_end_markers:
-        index = text.lower().find(marker.lower())
+        index = text_lower.find(marker.lower())
         if index != -1:
-            tokens_to_marker = len(re.findall(r"[a-zþȝ]+", text[:index]))
-            total_tokens = len(re.findall(r"[a-zþȝ]+", text))
-            normalized_pos = tokens_to_marker / total_tokens
+            # Token start offsets are sorted, so counting tokens before the marker is a binary search
+            normalized_pos = stream.tokens_before(index) / len(stream)
             fitt_positions.append(normalized_pos)
     
     return fitt_positions
 
-def read_csv_by_theme(plot_theme):
-    """Read CSV files for different AI models based on theme"""
-    pt = plot_theme.lower()
-    try:
-        if pt == "emotion":
-            df_chatgpt = pd.read_csv('./from_full_text/chatgpt/emotion_words.csv')
-            df_claude = pd.read_csv('./from_full_text/claude/sggk-emotion-words.csv')
-            df_grok = pd.read_csv('./from_full_text/grok/emotion_words_sggk.csv')
-        elif pt == "religious":
-            df_chatgpt = pd.read_csv('./from_full_text/chatgpt/religious_words.csv')
-            df_claude = pd.read_csv('./from_full_text/claude/sggk-religious-words.csv')
-            df_grok = pd.read_csv('./from_full_text/grok/religious_words_sggk.csv')
-        else:
-            raise ValueError(f"Unknown theme {plot_theme!r}")
-        
-        words_chatgpt = set(df_chatgpt.iloc[:,0].str.lower())
-        words_claude = set(df_claude.iloc[:,0].str.lower())
-        words_grok = set(df_grok.iloc[:,0].str.lower())
-        
-        return words_chatgpt, words_claude, words_grok
-    except Exception as e:
-        st.error(f"Error loading theme data: {str(e)}")
-        return set(), set(), set()
-
-def get_positions(words_chatgpt, words_claude, words_grok, tokens, total_tokens):
-    """Get normalized positions of words in the text"""
-    positions_chatgpt = []
-    positions_claude = []
-    positions_grok = []
-    
-    for index, token in enumerate(tokens):
-        relative_position = index / total_tokens
-        
-        if token in words_chatgpt:
-            positions_chatgpt.append(relative_position)
-        if token in words_claude:
-            positions_claude.append(relative_position)
-        if token in words_grok:
-            positions_grok.append(relative_position)
-    
-    return positions_chatgpt, positions_claude, positions_grok
-
-def display_distribution_stats(positions_chatgpt, positions_claude, positions_grok):
+def display_distribution_stats(model_positions):
     """Display statistics about the distribution"""
     st.markdown("#### 📊 Model Comparison")
     st.markdown("""
@@ -330,36 +403,58 @@ def display_distribution_stats(positions_chatgpt, positions_claude, positions_gr
     interpretations of what constitutes emotional or religious content.
     """)
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric("ChatGPT Words", len(positions_chatgpt))
-    with col2:
-        st.metric("Claude Words", len(positions_claude))
-    with col3:
-        st.metric("Grok Words", len(positions_grok))
+    for column, (model, positions) in zip(st.columns(len(model_positions)), model_positions.items()):
+        with column:
+            st.metric(f"{model} Words", len(positions))
+
+def display_positions_export(registry, stream, text, theme):
+    """Download every matched token position per model, streamed from the token stream in chunks"""
+    with st.expander(f"⬇ Export {theme.lower()} word positions per model"):
+        export_format = st.radio("Format:", list(EXPORT_FORMATS), horizontal=True, key="positions_export_format")
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(
+            f"Download {export_format}",
+            lambda: export_bytes(position_chunks(registry, stream, text), extension, POSITION_COLUMNS),
+            file_name=f"{theme.lower()}-positions.{extension}",
+            mime=mime,
+            on_click="ignore",
+            key="positions_export_btn"
+        )
 
-def display_overlap_analysis(words_chatgpt, words_claude, words_grok):
+def display_overlap_analysis(registry):
     """Display the overlap analysis"""
     st.markdown("#### 🔄 Word Overlap Analysis")
     st.markdown("""
     This analysis shows which words were identified by multiple AI models, revealing 
     consensus about key thematic terms. Higher overlap suggests stronger agreement 
-    about which words carry emotional or religious significance.
+    about which words carry emotional or religious significance. The chart counts each 
+    word once, under the exact combination of models that identified it.
     """)
     
-    # Calculate overlaps
-    overlap_all = words_chatgpt & words_claude & words_grok
-    overlap_chatgpt_claude = words_chatgpt & words_claude
-    overlap_chatgpt_grok = words_chatgpt & words_grok
-    overlap_claude_grok = words_claude & words_grok
-    
+    models = registry.models
     col1, col2 = st.columns(2)
     
     with col1:
-        st.write(f"**Words identified by all three models:** {len(overlap_all)}")
-        st.write(f"**ChatGPT & Claude overlap:** {len(overlap_chatgpt_claude)}")
+        st.write(f"**Words identified by all {len(models)} models:** {registry.overlap(models)}")
+        for size in range(len(models) - 1, 1, -1):
+            for group in combinations(models, size):
+                st.write(f"**{' & '.join(group)} overlap:** {registry.overlap(group)}")
     
     with col2:
-        st.write(f"**ChatGPT & Grok overlap:** {len(overlap_chatgpt_grok)}")
-        st.write(f"**Claude & Grok overlap:** {len(overlap_claude_grok)}")
+        upset = registry.upset_counts()
+        fig = go.Figure(go.Bar(
+            x=upset['Words'],
+            y=upset['Models'],
+            orientation='h',
+            marker=dict(color='#00a86b'),
+            hovertemplate='%{y}: %{x} words<extra></extra>'
+        ))
+        fig.update_layout(
+            title="Words by Combination of Models",
+            xaxis_title="Words",
+            yaxis=dict(autorange='reversed'),
+            height=max(250, 35 * len(upset) + 100),
+            margin=dict(l=10, r=10, t=40, b=10)
+        )
+        with span('plotly.model_overlap'):
+            st.plotly_chart(fig, use_container_width=True)
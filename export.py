@@ -0,0 +1,103 @@
+# src/export.py
+"""
+Chunked export of search results and per-model token positions to CSV or Parquet.
+Rows are produced a chunk at a time (WordIndex.occurrence_chunks, position_chunks)
+and appended to a temporary file, so a broad query is never expanded into one
+DataFrame; only the finished file is read back for the download.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from cooccurrence import line_breaks, token_line_numbers
+from inverted_index import CHUNK_ROWS
+
+# Download formats: label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ('csv', 'text/csv'),
+    "Parquet": ('parquet', 'application/vnd.apache.parquet'),
+}
+# Tokens of the stream scanned at a time for the position export
+CHUNK_TOKENS = 1 << 18
+POSITION_COLUMNS = ['Model', 'Word', 'Token', 'Position', 'Line Number']
+
+
+def frame_chunks(df, chunk_rows=CHUNK_ROWS):
+    """Slices of an in-memory DataFrame, for writing it with write_chunks"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def position_chunks(registry, stream, text, chunk_tokens=CHUNK_TOKENS):
+    """
+    Yield one row per (token, model) for every token a model's lexicon matched, in
+    text order, scanning the token stream chunk_tokens at a time. text is the
+    lowercased text the stream was encoded from, used for 1-based line numbers.
+    """
+    models = np.asarray(registry.models, dtype=object)
+    model_bits = np.asarray([registry.bits([model]) for model in registry.models], dtype=registry.membership.dtype)
+    vocab = np.asarray(stream.vocab, dtype=object)
+    newlines = line_breaks(text)
+    total_tokens = max(len(stream), 1)
+    for start in range(0, len(stream), chunk_tokens):
+        ids = np.asarray(stream.ids[start:start + chunk_tokens])
+        hits = (registry.membership[ids][:, None] & model_bits[None, :]) != 0
+        # Row-major nonzero orders hits by token, then by model
+        tokens, model_index = np.nonzero(hits)
+        token_index = start + tokens
+        yield pd.DataFrame({
+            'Model': models[model_index],
+            'Word': vocab[ids[tokens]],
+            'Token': token_index,
+            'Position': token_index / total_tokens,
+            'Line Number': token_line_numbers(text, stream.starts[token_index], newlines) + 1,
+        }, columns=POSITION_COLUMNS)
+
+
+def write_chunks(chunks, path, fmt, columns):
+    """Append DataFrame chunks to one CSV or Parquet file; columns head an empty result"""
+    wrote = False
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                chunk.to_csv(f, header=not wrote, index=False)
+                wrote = True
+            if not wrote:
+                pd.DataFrame(columns=columns).to_csv(f, index=False)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    first_empty = None
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                # An empty object column has no type to infer, so the schema comes from the first rows
+                if first_empty is None:
+                    first_empty = chunk
+                continue
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is None:
+            empty = pd.DataFrame(columns=columns) if first_empty is None else first_empty
+            pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_bytes(chunks, fmt, columns):
+    """Write chunks to a temporary file in fmt ('csv' or 'parquet') and return the file's contents"""
+    fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+    os.close(fd)
+    try:
+        write_chunks(chunks, path, fmt, columns)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,104 @@
+# src/frame_memory.py
+"""
+Compact in-memory representation for occurrence tables, and a per-column
+memory report comparing a frame before and after compaction.
+
+    python frame_memory.py                      # report on the bundled data files
+    python frame_memory.py target_word_data.csv
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+# A text column becomes categorical when it has at most this share of distinct values
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+INT32 = np.iinfo(np.int32)
+
+
+def compact_frame(df):
+    """
+    Return a compact copy of df: repetitive text columns (words, line text, document
+    names) become dictionary-encoded categoricals, and integer-valued numeric columns
+    that fit become int32. Float columns are only narrowed when they hold no NaN.
+    """
+    compact = df.copy()
+    for column in compact.columns:
+        series = compact[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(series) or series.dtype == object:
+            if len(series) and series.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * len(series):
+                compact[column] = series.astype('category')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy()
+            if len(values) == 0 or np.isnan(values.astype(float)).any():
+                continue
+            if (np.mod(values, 1) == 0).all() and INT32.min <= values.min() and values.max() <= INT32.max:
+                compact[column] = values.astype(np.int32)
+    return compact
+
+
+def freeze_frame(df):
+    """
+    Return df with its NumPy and categorical-code buffers marked read-only, for frames
+    shared between sessions: an in-place write to the shared data raises instead of
+    changing what every other session sees.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column].array
+        if isinstance(values, pd.Categorical):
+            codes = np.array(values.codes)
+            codes.flags.writeable = False
+            columns[column] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif isinstance(df[column].dtype, np.dtype):
+            array = np.array(df[column].to_numpy())
+            array.flags.writeable = False
+            columns[column] = array
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def memory_report(before, after):
+    """Per-column deep memory use in bytes before and after compaction, with a total row"""
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Column': list(before_bytes.index),
+        'Before dtype': [str(before[c].dtype) for c in before_bytes.index],
+        'After dtype': [str(after[c].dtype) for c in before_bytes.index],
+        'Before (bytes)': before_bytes.to_numpy(),
+        'After (bytes)': after_bytes.reindex(before_bytes.index).to_numpy(),
+    })
+    total = pd.DataFrame([{'Column': 'TOTAL', 'Before dtype': '', 'After dtype': '',
+                           'Before (bytes)': int(before_bytes.sum()), 'After (bytes)': int(after_bytes.sum())}])
+    report = pd.concat([report, total], ignore_index=True)
+    report['Ratio'] = (report['Before (bytes)'] / report['After (bytes)'].clip(lower=1)).round(2)
+    return report
+
+
+def read_table(path):
+    """Read a data file the way the app does, forward-filling the legacy occurrence CSV layout"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    if path.endswith('word_occurrences.csv'):
+        df['Word'] = df['Word'].ffill()
+        df['Frequency'] = df['Frequency'].ffill()
+    return df
+
+
+def main():
+    paths = sys.argv[1:] or ['word_occurrences.csv', 'word_occurrences.parquet', 'target_word_data.csv']
+    for path in paths:
+        before = read_table(path)
+        report = memory_report(before, compact_frame(before))
+        print(f"\n{path} ({len(before):,} rows)")
+        print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
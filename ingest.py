@@ -0,0 +1,111 @@
+# src/ingest.py
+"""
+Corpus ingest: tokenize one or more texts in a process pool and write the word
+occurrence table the app loads, as Parquet (or Arrow/Feather).
+
+    python ingest.py full-sggk.txt -o word_occurrences.parquet
+    python ingest.py corpus/passus-*.txt -o passus_occurrences.parquet --workers 4
+"""
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from inverted_index import tokenize_line_with_offsets
+
+OCCURRENCES_FILE = 'word_occurrences.parquet'
+# Small enough that the 2,530-line poem alone is split across several workers
+SHARD_LINES = 500
+
+
+def tokenize_shard(shard):
+    """
+    Tokenize one shard of lines into word counts and one row per distinct (word, line).
+    Rows keep the byte offset of the word's first token in the line instead of the line
+    text, which the concordance slices from the source file when it is needed.
+    """
+    document, first_line, lines = shard
+    counts = Counter()
+    words, line_numbers, byte_offsets = [], [], []
+    for line_number, line in enumerate(lines, first_line):
+        tokens = tokenize_line_with_offsets(line)
+        counts.update(word for word, _ in tokens)
+        seen = set()
+        for word, char_offset in tokens:
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                line_numbers.append(line_number)
+                byte_offsets.append(len(line[:char_offset].encode('utf-8')))
+    return document, counts, words, line_numbers, byte_offsets
+
+
+def make_shards(paths, shard_lines=SHARD_LINES):
+    """Split each text into (document path, first line number, lines) shards"""
+    shards = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            # Split on '\n' only, so line numbers agree with the concordance's line offsets
+            lines = f.read().split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        for start in range(0, len(lines), shard_lines):
+            shards.append((path, start + 1, lines[start:start + shard_lines]))
+    return shards
+
+
+def ingest(paths, output=OCCURRENCES_FILE, workers=None, shard_lines=SHARD_LINES):
+    """
+    Tokenize texts in parallel, merge per-shard counts and write the occurrence table.
+    Frequency is the word's count across all ingested texts.
+    """
+    shards = make_shards(paths, shard_lines)
+    documents = list(dict.fromkeys(shard[0] for shard in shards))
+
+    counts = Counter()
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for document, shard_counts, words, line_numbers, byte_offsets in pool.map(tokenize_shard, shards):
+            counts.update(shard_counts)
+            frames.append(pd.DataFrame({
+                'Document': document,
+                'Word': pd.Series(words, dtype=str),
+                'Line Number': pd.Series(line_numbers, dtype='int32'),
+                'Byte Offset': pd.Series(byte_offsets, dtype='int32'),
+            }))
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['Document', 'Word', 'Line Number', 'Byte Offset'])
+    df['Document'] = pd.Categorical(df['Document'], categories=documents)
+    df['Frequency'] = df['Word'].map(counts).astype('int32')
+    # Same layout as word_occurrences.csv: words alphabetically, then text order
+    df = df.sort_values(['Word', 'Document', 'Line Number'], kind='stable', ignore_index=True)
+    df = df[['Document', 'Word', 'Frequency', 'Line Number', 'Byte Offset']]
+
+    if output.endswith(('.arrow', '.feather')):
+        df.to_feather(output)
+    else:
+        df.to_parquet(output, index=False)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the word occurrence table from one or more texts.")
+    parser.add_argument('texts', nargs='+', help="UTF-8 text files, one line of verse per line")
+    parser.add_argument('-o', '--output', default=OCCURRENCES_FILE,
+                        help=f"output .parquet or .arrow/.feather file (default: {OCCURRENCES_FILE})")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--shard-lines', type=int, default=SHARD_LINES,
+                        help=f"lines per tokenization shard (default: {SHARD_LINES})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = ingest(args.texts, args.output, args.workers, args.shard_lines)
+    print(f"Ingested {len(args.texts)} text(s): {df['Word'].nunique():,} words, "
+          f"{len(df):,} occurrence rows -> {args.output} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
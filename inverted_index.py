@@ -0,0 +1,538 @@
+# src/inverted_index.py
+import difflib
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+import numpy as np
+import pandas as pd
+
+from concordance import Concordance, line_start_offsets
+from spans import timed
+from spelling import SpellingIndex
+
+INDEX_DIR = 'index'
+SOURCE_TEXT = 'full-sggk.txt'
+# Copy of the indexed text kept with the index, so editing the source never moves
+# bytes under the concordance's memory map
+SNAPSHOT_NAME = 'source.txt'
+# How long WordIndex waits for a concurrent rewrite of the index to finish
+OPEN_TIMEOUT = 10.0
+
+# Same tokenization the word-by-line notebook used to produce word_occurrences.csv
+TOKEN_SPLIT = re.compile(r'\s+|--')
+NON_WORD = re.compile(r'[^\wþȝð-]')
+# Regex searches stop once this much time has been spent scanning the vocabulary
+PATTERN_TIME_BUDGET = 0.25
+MAX_PATTERN_LENGTH = 200
+# re cannot be interrupted inside one match, so patterns that can backtrack
+# exponentially (a repeat over a repeat or alternation) are refused, and the number
+# of variable-length repeats is capped to keep the polynomial cases small too
+MAX_VARIABLE_REPEATS = 4
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+# Occurrence rows expanded at a time when streaming a whole result (e.g. for export)
+CHUNK_ROWS = 10000
+
+
+def _subpatterns(value):
+    """Parsed sub-patterns nested anywhere in one node's arguments"""
+    if isinstance(value, sre_parse.SubPattern):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _subpatterns(item)
+
+
+def _variable_repeats(pattern, inside_repeat=False):
+    """
+    Count the variable-length repeats in a parsed pattern, raising re.error for a
+    repeat nested in another repeat or an alternation under a repeat.
+    """
+    count = 0
+    for op, value in pattern:
+        if op in _REPEATS:
+            low, high, body = value
+            if inside_repeat and low != high:
+                raise re.error("nested quantifiers such as (a*)* can take exponential time")
+            count += low != high
+            count += _variable_repeats(body, inside_repeat or high > 1)
+            continue
+        if op is sre_parse.BRANCH and inside_repeat:
+            raise re.error("a quantified alternation such as (a|ab)* can take exponential time")
+        for sub in _subpatterns(value):
+            count += _variable_repeats(sub, inside_repeat)
+    return count
+
+
+@lru_cache(maxsize=128)
+def compile_search_pattern(pattern):
+    """
+    Compile a user search pattern once; raises re.error for an invalid pattern or one
+    whose backtracking could run far past PATTERN_TIME_BUDGET on a single word.
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise re.error(f"pattern is longer than {MAX_PATTERN_LENGTH} characters")
+    if _variable_repeats(sre_parse.parse(pattern, re.IGNORECASE)) > MAX_VARIABLE_REPEATS:
+        raise re.error(f"pattern has more than {MAX_VARIABLE_REPEATS} variable-length repeats")
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def tokenize_line(line):
+    """Split a line into lowercase word tokens"""
+    tokens = []
+    for token in TOKEN_SPLIT.split(line.lower()):
+        word = NON_WORD.sub('', token)
+        if word:
+            tokens.append(word)
+    return tokens
+
+
+def tokenize_line_with_offsets(line):
+    """Like tokenize_line, but pair each token with the character offset where it starts"""
+    tokens = []
+    start = 0
+    for separator in list(TOKEN_SPLIT.finditer(line)) + [None]:
+        end = separator.start() if separator else len(line)
+        word = NON_WORD.sub('', line[start:end].lower())
+        if word:
+            tokens.append((word, start))
+        if separator:
+            start = separator.end()
+    return tokens
+
+
+def line_hashes(lines):
+    """64-bit hash of every line, the manifest update_index diffs against"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'little') for line in lines),
+        dtype=np.uint64, count=len(lines))
+
+
+def _read_lines(text_path):
+    """Raw bytes of a text and its lines split on '\n', as the concordance's line offsets count them"""
+    with open(text_path, 'rb') as f:
+        data = f.read()
+    line_starts = line_start_offsets(data)
+    return data, line_starts, data.decode('utf-8').split('\n')[:len(line_starts) - 1]
+
+
+def _tokenize_lines(lines, line_numbers):
+    """Postings (word, line number, token offset, byte offset) for the given lines"""
+    words, numbers, token_offsets, byte_offsets = [], [], [], []
+    for line_number in line_numbers:
+        line = lines[line_number - 1]
+        for offset, (word, char_offset) in enumerate(tokenize_line_with_offsets(line)):
+            words.append(word)
+            numbers.append(line_number)
+            token_offsets.append(offset)
+            byte_offsets.append(len(line[:char_offset].encode('utf-8')))
+    return words, numbers, token_offsets, byte_offsets
+
+
+def _save(index_dir, name, write, mode='wb'):
+    """Write one index file via a temporary file and rename, so open memory maps keep the old file"""
+    path = os.path.join(index_dir, name)
+    with open(path + '.tmp', mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        write(f)
+    os.replace(path + '.tmp', path)
+
+
+def read_meta(index_dir=INDEX_DIR):
+    """The index's meta.json: build generation, source path and corpus totals"""
+    with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_index(index_dir, text_path, data, vocab, word_ids, postings, line_starts, hashes):
+    """
+    Sort postings by (word, line, token offset), derive offsets and line counts, and write
+    every index file plus a snapshot of the text (data). meta.json's generation works as
+    a seqlock: it is made odd before the first file is replaced and even again after the
+    last, so WordIndex can tell when the files it opened belong to one build.
+    """
+    word_ids = np.asarray(word_ids, dtype=np.int32)
+    postings = np.asarray(postings, dtype=np.int32).reshape(-1, 3)
+    order = np.lexsort((postings[:, 1], postings[:, 0], word_ids))
+    sorted_ids = word_ids[order]
+    postings = postings[order]
+
+    counts = np.bincount(sorted_ids, minlength=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    # A posting starts a new (word, line) row when the word or the line changes
+    new_row = np.ones(len(sorted_ids), dtype=bool)
+    new_row[1:] = (sorted_ids[1:] != sorted_ids[:-1]) | (postings[1:, 0] != postings[:-1, 0])
+    line_counts = np.bincount(sorted_ids[new_row], minlength=len(vocab)).astype(np.int32)
+
+    os.makedirs(index_dir, exist_ok=True)
+    try:
+        previous = read_meta(index_dir)
+    except FileNotFoundError:
+        previous = None
+    generation = (previous or {}).get('generation', 0) // 2 * 2 + 2
+    if previous is not None:
+        _save(index_dir, 'meta.json', lambda f: json.dump({**previous, 'generation': generation - 1}, f, indent=2), 'w')
+
+    _save(index_dir, 'vocab.txt', lambda f: f.write('\n'.join(vocab) + '\n'), 'w')
+    _save(index_dir, SNAPSHOT_NAME, lambda f: f.write(data))
+    for name, array in (('offsets.npy', offsets), ('postings.npy', postings), ('line_counts.npy', line_counts),
+                        ('line_starts.npy', line_starts), ('line_hashes.npy', hashes)):
+        _save(index_dir, name, lambda f: np.save(f, array))
+
+    meta = {
+        'generation': generation,
+        'source': text_path,
+        'lines': len(hashes),
+        'tokens': int(len(postings)),
+        'vocabulary': len(vocab),
+        'first_line': int(postings[:, 0].min()) if len(postings) else 0,
+        'last_line': int(postings[:, 0].max()) if len(postings) else 0,
+    }
+    _save(index_dir, 'meta.json', lambda f: json.dump(meta, f, indent=2), 'w')
+    return meta
+
+
+def build_index(text_path=SOURCE_TEXT, index_dir=INDEX_DIR):
+    """
+    Build the on-disk positional inverted index for a text.
+
+    The index directory holds:
+    - vocab.txt: one word per line, sorted (word ID = line number - 1)
+    - offsets.npy: int64, word ID -> start of its postings (length V + 1)
+    - postings.npy: int32 (N, 3) array of (line number, token offset in line,
+      byte offset of the token in the line)
+    - line_counts.npy: int32, number of distinct lines each word appears on
+    - line_starts.npy: int64, byte offset where each line starts (length lines + 1)
+    - line_hashes.npy: uint64, hash of each line, for incremental updates
+    - source.txt: the text as indexed, which the concordance maps
+    - meta.json: build generation, source path and corpus totals
+    """
+    data, line_starts, lines = _read_lines(text_path)
+    words, line_numbers, token_offsets, byte_offsets = _tokenize_lines(lines, range(1, len(lines) + 1))
+
+    vocab = sorted(set(words))
+    word_to_id = {word: i for i, word in enumerate(vocab)}
+    word_ids = np.fromiter((word_to_id[w] for w in words), dtype=np.int32, count=len(words))
+    postings = np.column_stack((line_numbers, token_offsets, byte_offsets))
+    return _write_index(index_dir, text_path, data, vocab, word_ids, postings, line_starts, line_hashes(lines))
+
+
+def update_index(text_path=SOURCE_TEXT, index_dir=INDEX_DIR):
+    """
+    Bring an existing index up to date with an edited text, re-tokenizing only changed lines.
+
+    The text's line hashes are diffed against the manifest (line_hashes.npy). Postings on
+    unchanged lines are kept and renumbered to their new line, postings on removed or
+    edited lines are dropped, and only inserted or edited lines are tokenized again.
+    Counts, offsets and line offsets are then rederived. Falls back to a full build when
+    there is no index or manifest. Returns (meta, changed line count).
+    """
+    manifest = os.path.join(index_dir, 'line_hashes.npy')
+    if not os.path.exists(os.path.join(index_dir, 'meta.json')) or not os.path.exists(manifest):
+        meta = build_index(text_path, index_dir)
+        return meta, meta['lines']
+
+    data, line_starts, lines = _read_lines(text_path)
+    new_hashes = line_hashes(lines)
+    old = WordIndex(index_dir)
+    old_hashes = np.load(manifest)
+
+    # Old line number -> new line number, 0 where the line was removed or edited
+    line_map = np.zeros(len(old_hashes) + 1, dtype=np.int32)
+    changed = []
+    matcher = difflib.SequenceMatcher(None, old_hashes.tolist(), new_hashes.tolist())
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            line_map[i1 + 1:i2 + 1] = np.arange(j1 + 1, j2 + 1)
+        else:
+            changed.extend(range(j1 + 1, j2 + 1))
+
+    old_ids = np.repeat(np.arange(len(old.vocab), dtype=np.int32), old.frequencies)
+    old_postings = np.array(old.postings)
+    new_lines = line_map[old_postings[:, 0]]
+    kept = new_lines > 0
+    kept_ids = old_ids[kept]
+    kept_postings = old_postings[kept]
+    kept_postings[:, 0] = new_lines[kept]
+
+    words, line_numbers, token_offsets, byte_offsets = _tokenize_lines(lines, changed)
+    vocab = sorted(set(old.vocab[i] for i in np.unique(kept_ids)) | set(words))
+    word_to_id = {word: i for i, word in enumerate(vocab)}
+    # Renumber kept postings into the new vocabulary; words now absent map to -1 and are unused
+    old_to_new = np.array([word_to_id.get(word, -1) for word in old.vocab], dtype=np.int32)
+    word_ids = np.concatenate((
+        old_to_new[kept_ids],
+        np.fromiter((word_to_id[w] for w in words), dtype=np.int32, count=len(words)),
+    ))
+    postings = np.concatenate((
+        kept_postings,
+        np.column_stack((line_numbers, token_offsets, byte_offsets)).reshape(-1, 3).astype(np.int32),
+    ))
+    del old
+    return _write_index(index_dir, text_path, data, vocab, word_ids, postings, line_starts, new_hashes), len(changed)
+
+
+class WordIndex:
+    """Read-only view over a prebuilt index, with postings memory-mapped from disk"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        # Open every file between two reads of an even, unchanged generation, so a
+        # concurrent update_index can never mix files from two builds
+        deadline = time.monotonic() + OPEN_TIMEOUT
+        while True:
+            self.meta = read_meta(index_dir)
+            generation = self.meta.get('generation', 0)
+            if generation % 2 == 0:
+                self._open_files(index_dir)
+                if read_meta(index_dir).get('generation', 0) == generation:
+                    break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"the index in {index_dir}/ is still being rewritten")
+            time.sleep(0.05)
+        self.word_to_id = {word: i for i, word in enumerate(self.vocab)}
+        self.frequencies = np.diff(self.offsets)
+        self.trigrams = None  # built on first substring search
+        self.spelling = None  # built on first spelling-variant search
+
+    def _open_files(self, index_dir):
+        with open(os.path.join(index_dir, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            self.vocab = f.read().splitlines()
+        self.offsets = np.load(os.path.join(index_dir, 'offsets.npy'), mmap_mode='r')
+        self.postings = np.load(os.path.join(index_dir, 'postings.npy'), mmap_mode='r')
+        self.line_counts = np.load(os.path.join(index_dir, 'line_counts.npy'), mmap_mode='r')
+        line_starts = np.load(os.path.join(index_dir, 'line_starts.npy'), mmap_mode='r')
+        # Line text is sliced on demand from the index's own snapshot of the text; an
+        # index built before snapshots existed reads its source into memory instead
+        snapshot = os.path.join(index_dir, SNAPSHOT_NAME)
+        if os.path.exists(snapshot):
+            self.concordance = Concordance(snapshot, line_starts)
+        else:
+            self.concordance = Concordance(self.meta['source'], line_starts, in_memory=True)
+        self.content_hash = index_content_hash(index_dir)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def word_id(self, word):
+        """Return the ID of a word, or None if it is not in the vocabulary"""
+        return self.word_to_id.get(word.lower())
+
+    def _build_trigrams(self):
+        """Map every character trigram of the vocabulary to the sorted IDs of words containing it"""
+        trigrams = {}
+        for word_id, word in enumerate(self.vocab):
+            for gram in {word[i:i + 3] for i in range(len(word) - 2)}:
+                trigrams.setdefault(gram, []).append(word_id)
+        return {gram: np.asarray(ids, dtype=np.int32) for gram, ids in trigrams.items()}
+
+    @timed()
+    def match_words(self, term, exact=False):
+        """Return IDs of vocabulary words equal to, or containing, a search term"""
+        term = term.lower()
+        if exact:
+            word_id = self.word_to_id.get(term)
+            return [] if word_id is None else [word_id]
+        if len(term) < 3:
+            # Too short for trigrams; the vocabulary is small enough to scan
+            return [i for i, word in enumerate(self.vocab) if term in word]
+
+        if self.trigrams is None:
+            self.trigrams = self._build_trigrams()
+        candidates = None
+        for gram in {term[i:i + 3] for i in range(len(term) - 2)}:
+            ids = self.trigrams.get(gram)
+            if ids is None:
+                return []
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+        # Trigram hits can be false positives (e.g. 'abcab' for 'abcabc'), so verify each
+        return [int(i) for i in candidates if term in self.vocab[i]]
+
+    @timed()
+    def match_pattern(self, pattern, time_budget=PATTERN_TIME_BUDGET):
+        """
+        Return IDs of vocabulary words matching a regular expression. Only the distinct
+        words are scanned, never the occurrences; TimeoutError is raised if the scan
+        exceeds time_budget seconds, so a pathological pattern cannot stall the app.
+        """
+        regex = compile_search_pattern(pattern)
+        deadline = time.perf_counter() + time_budget
+        word_ids = []
+        for word_id, word in enumerate(self.vocab):
+            if regex.search(word):
+                word_ids.append(word_id)
+            # Words are short, so checking the clock between words bounds the overrun
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"pattern took longer than {time_budget:g}s to search")
+        return word_ids
+
+    @timed()
+    def match_variants(self, term, distance=1):
+        """Return IDs of vocabulary words spelled as variants of term, within distance edits of its normalized form"""
+        if self.spelling is None:
+            self.spelling = SpellingIndex(self.vocab)
+        return self.spelling.lookup(term.lower(), distance)
+
+    @timed()
+    def occurrence_count(self, word_ids):
+        """Total number of (word, line) occurrence rows for a set of word IDs"""
+        if len(word_ids) == 0:
+            return 0
+        return int(self.line_counts[np.asarray(word_ids)].sum())
+
+    @timed()
+    def occurrences_page(self, word_ids, start, stop, context=None):
+        """
+        Return only rows [start, stop) of occurrences_frame(word_ids), expanding
+        just the words that overlap the requested page.
+        """
+        if len(word_ids) == 0 or stop <= start:
+            return self.occurrences_frame([], context)
+        word_ids = np.asarray(word_ids)
+        row_ends = np.cumsum(self.line_counts[word_ids])
+        first = int(np.searchsorted(row_ends, start, side='right'))
+        last = int(np.searchsorted(row_ends, stop - 1, side='right'))
+        skip = start - (int(row_ends[first - 1]) if first > 0 else 0)
+        return self._expand_rows(word_ids[first:last + 1].tolist(), skip, stop - start, context)
+
+    def occurrence_chunks(self, word_ids, context=None, chunk_rows=CHUNK_ROWS):
+        """
+        Yield occurrences_frame(word_ids) as DataFrames of at most chunk_rows rows,
+        expanding one chunk at a time so the full result is never held in memory.
+        """
+        for start in range(0, self.occurrence_count(word_ids), chunk_rows):
+            yield self.occurrences_page(word_ids, start, start + chunk_rows, context)
+
+    def postings_for(self, word_id):
+        """Return the (line number, token offset, byte offset) postings of one word"""
+        return self.postings[self.offsets[word_id]:self.offsets[word_id + 1]]
+
+    def occurrence_lines(self, word_id):
+        """Return the distinct line numbers a word appears on, in order"""
+        return self.occurrence_rows(word_id)[:, 0]
+
+    def occurrence_rows(self, word_id):
+        """Return the first (line number, token offset, byte offset) posting of a word on each line"""
+        postings = self.postings_for(word_id)
+        if len(postings) == 0:
+            return np.asarray(postings)
+        keep = np.ones(len(postings), dtype=bool)
+        keep[1:] = postings[1:, 0] != postings[:-1, 0]
+        return np.asarray(postings[keep])
+
+    def context(self, line_number, byte_offset, context=None):
+        """
+        Text shown for one occurrence: the line itself by default, ('lines', n) for
+        n lines either side, or ('words', n) for n words either side of the keyword.
+        """
+        if context is None:
+            return self.concordance.line(line_number).strip()
+        mode, width = context
+        if mode == 'lines':
+            return self.concordance.lines(line_number, width)
+        left, keyword, right = self.concordance.kwic(line_number, byte_offset, width)
+        return f"{left} [{keyword}] {right}".strip()
+
+    def total_occurrences(self):
+        """Number of (word, line) occurrence rows, as listed in word_occurrences.csv"""
+        return int(self.line_counts.sum())
+
+    def word_frequency_frame(self):
+        """Return unique words with their frequencies, most frequent first"""
+        word_freq = pd.DataFrame({'Word': self.vocab, 'Frequency': self.frequencies})
+        return word_freq.sort_values('Frequency', ascending=False, kind='stable')
+
+    def occurrence_table(self):
+        """
+        Every (word, line) occurrence row, in the ingest table layout: Word, Frequency,
+        Line Number and the Byte Offset of the word's first token on the line.
+        """
+        word_ids = np.repeat(np.arange(len(self.vocab)), self.frequencies)
+        postings = np.asarray(self.postings)
+        first = np.ones(len(postings), dtype=bool)
+        first[1:] = (word_ids[1:] != word_ids[:-1]) | (postings[1:, 0] != postings[:-1, 0])
+        row_ids = word_ids[first]
+        return pd.DataFrame({
+            'Word': pd.Categorical.from_codes(row_ids, categories=self.vocab),
+            'Frequency': self.frequencies[row_ids],
+            'Line Number': postings[first, 0],
+            'Byte Offset': postings[first, 2],
+        })
+
+    def occurrences_frame(self, word_ids, context=None):
+        """
+        Expand word IDs into Word / Frequency / Line Number / Line Content rows.
+        context selects what Line Content holds (see WordIndex.context).
+        """
+        return self._expand_rows(word_ids, 0, None, context)
+
+    def _expand_rows(self, word_ids, skip, limit, context):
+        """Expand word IDs into occurrence rows, building rows only for the slice kept"""
+        rows = []
+        for word_id in word_ids:
+            word_rows = self.occurrence_rows(word_id)
+            if skip >= len(word_rows):
+                skip -= len(word_rows)
+                continue
+            word_rows, skip = word_rows[skip:], 0
+            if limit is not None:
+                word_rows = word_rows[:limit - len(rows)]
+            rows.extend((word_id, line_number, byte_offset) for line_number, _, byte_offset in word_rows.tolist())
+            if limit is not None and len(rows) >= limit:
+                break
+        return pd.DataFrame({
+            'Word': pd.Series([self.vocab[w] for w, _, _ in rows], dtype=str),
+            'Frequency': np.asarray([self.frequencies[w] for w, _, _ in rows], dtype=np.int64),
+            'Line Number': np.asarray([ln for _, ln, _ in rows], dtype=np.int64),
+            'Line Content': pd.Series([self.context(ln, off, context) for _, ln, off in rows], dtype=str),
+        })
+
+
+def index_content_hash(index_dir=INDEX_DIR):
+    """SHA-1 over the index files, used to key caches of data derived from the index"""
+    digest = hashlib.sha1()
+    for name in ('meta.json', 'vocab.txt', 'offsets.npy', 'line_counts.npy'):
+        with open(os.path.join(index_dir, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def index_version(index_dir=INDEX_DIR):
+    """Modification time of meta.json, which every build or update rewrites last; None if unbuilt"""
+    try:
+        return os.stat(os.path.join(index_dir, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def open_index(index_dir=INDEX_DIR, text_path=SOURCE_TEXT):
+    """Open the index in index_dir, building it from text_path first if it is missing"""
+    if not os.path.exists(os.path.join(index_dir, 'meta.json')):
+        build_index(text_path, index_dir)
+    return WordIndex(index_dir)
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if arg != '--update']
+    text_path = args[0] if len(args) > 0 else SOURCE_TEXT
+    index_dir = args[1] if len(args) > 1 else INDEX_DIR
+    if '--update' in sys.argv:
+        meta, changed = update_index(text_path, index_dir)
+        print(f"Re-indexed {changed:,} changed line(s) of {text_path}: {meta['tokens']:,} tokens "
+              f"({meta['vocabulary']:,} words, {meta['lines']:,} lines) in {index_dir}/")
+    else:
+        meta = build_index(text_path, index_dir)
+        print(f"Indexed {meta['tokens']:,} tokens ({meta['vocabulary']:,} words, "
+              f"{meta['lines']:,} lines) from {text_path} into {index_dir}/")
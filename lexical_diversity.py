@@ -0,0 +1,138 @@
+# src/lexical_diversity.py
+"""
+Lexical diversity measures over a token-ID array (see token_stream.TokenStream):
+TTR, MATTR, MTLD and HD-D, computed per fitt and as a rolling curve over the poem.
+Parameters default to the ones prelim-data/lexical_diversity.ipynb passed to
+lexicalrichness, so the values are comparable with the notebook's table.
+"""
+import numpy as np
+import pandas as pd
+
+MATTR_WINDOW = 25
+MTLD_THRESHOLD = 0.72
+HDD_DRAWS = 42
+
+
+def previous_occurrence(ids):
+    """Index of the previous token with the same ID, or -1 for a word's first occurrence"""
+    ids = np.asarray(ids)
+    order = np.argsort(ids, kind='stable')
+    previous = np.full(len(ids), -1, dtype=np.int64)
+    same = ids[order[1:]] == ids[order[:-1]]
+    previous[order[1:][same]] = order[:-1][same]
+    return previous
+
+
+def window_type_counts(ids, window):
+    """
+    Number of distinct types in every window of `window` consecutive tokens, in O(n).
+    A token at i is the first of its type in windows starting at s when
+    max(previous occurrence + 1, i - window + 1) <= s <= i, so each token adds one
+    to a contiguous range of window starts, summed with a difference array.
+    """
+    n = len(ids)
+    if n < window:
+        return np.empty(0, dtype=np.int64)
+    starts = n - window + 1
+    positions = np.arange(n)
+    low = np.maximum(previous_occurrence(ids) + 1, positions - window + 1)
+    high = np.minimum(positions, starts - 1)
+    valid = low <= high
+    diff = np.bincount(low[valid], minlength=starts + 1) - np.bincount(high[valid] + 1, minlength=starts + 1)
+    return np.cumsum(diff[:starts])
+
+
+def ttr(ids):
+    """Type-token ratio"""
+    return len(np.unique(ids)) / len(ids) if len(ids) else 0.0
+
+
+def mattr(ids, window=MATTR_WINDOW):
+    """Moving-average type-token ratio over windows of `window` tokens"""
+    if len(ids) < window:
+        return ttr(ids)
+    return float(window_type_counts(ids, window).mean() / window)
+
+
+def _mtld_pass(ids, threshold):
+    """Tokens per factor in one direction: a factor ends each time the running TTR reaches threshold"""
+    types, count, factors, running_ttr = set(), 0, 0.0, 1.0
+    for token in ids:
+        count += 1
+        types.add(token)
+        running_ttr = len(types) / count
+        if running_ttr <= threshold:
+            types, count = set(), 0
+            factors += 1
+    if count:
+        factors += (1 - running_ttr) / (1 - threshold)
+    if factors == 0:
+        whole = ttr(ids)
+        factors = 1 if whole == 1 else (1 - whole) / (1 - threshold)
+    return len(ids) / factors
+
+
+def mtld(ids, threshold=MTLD_THRESHOLD):
+    """Measure of textual lexical diversity: mean of a forward and a backward single pass"""
+    if len(ids) == 0:
+        return 0.0
+    ids = np.asarray(ids).tolist()
+    return (_mtld_pass(ids, threshold) + _mtld_pass(ids[::-1], threshold)) / 2
+
+
+def hdd(ids, draws=HDD_DRAWS):
+    """
+    HD-D: the expected share of types seen in a random sample of `draws` tokens.
+    P(type absent from the sample) is the hypergeometric pmf at 0, the product of
+    (N - K - j) / (N - j) over j < draws, evaluated for every type frequency K at once.
+    """
+    n = len(ids)
+    if n == 0:
+        return 0.0
+    draws = min(draws, n)
+    _, frequencies = np.unique(ids, return_counts=True)
+    j = np.arange(draws)
+    ratios = np.clip((n - frequencies[:, None] - j) / (n - j), 0, None)
+    absent = ratios.prod(axis=1)
+    return float(((1 - absent) / draws).sum())
+
+
+def diversity_measures(ids):
+    """All measures for one stretch of text, as a dict"""
+    return {
+        'Tokens': len(ids),
+        'Types': len(np.unique(ids)),
+        'TTR': ttr(ids),
+        'MATTR': mattr(ids),
+        'MTLD': mtld(ids),
+        'HD-D': hdd(ids),
+    }
+
+
+def fitt_diversity(ids, boundaries):
+    """
+    One row of measures per fitt plus one for the whole poem. boundaries are the
+    token indices where each fitt ends; tokens after the last one are ignored.
+    """
+    rows = []
+    start = 0
+    for fitt, end in enumerate(boundaries, 1):
+        rows.append({'Section': f'Fitt {fitt}', **diversity_measures(ids[start:end])})
+        start = end
+    rows.append({'Section': 'Whole poem', **diversity_measures(ids)})
+    return pd.DataFrame(rows)
+
+
+def rolling_diversity(ids, window=500, points=400):
+    """
+    TTR of a window sliding over the poem, sampled at up to `points` window positions.
+    Position is the normalized (0-1) centre of each window, as in the distribution plots.
+    """
+    counts = window_type_counts(ids, window)
+    if len(counts) == 0:
+        return pd.DataFrame({'Position': [], 'TTR': []})
+    starts = np.unique(np.linspace(0, len(counts) - 1, min(points, len(counts))).astype(np.int64))
+    return pd.DataFrame({
+        'Position': (starts + window / 2) / len(ids),
+        'TTR': counts[starts] / window,
+    })
@@ -0,0 +1,59 @@
+# src/lexicon_matcher.py
+import re
+
+import pandas as pd
+
+WORD_RUN = re.compile(r'\w+')
+
+
+class LexiconMatcher:
+    """
+    Finds whole-word occurrences of every lexicon word in a single pass over the lines.
+
+    A word made only of word characters matches a line exactly when it equals one of
+    the line's maximal \\w+ runs, which is what r'\\b' + word + r'\\b' tests. Those words
+    are looked up in a dict keyed by word; anything else (hyphens, apostrophes, spaces)
+    falls back to a regex compiled once per word rather than once per line.
+    """
+
+    def __init__(self, words):
+        self.words = [str(w).lower() for w in words]
+        self.simple = {}
+        self.patterns = []
+        for word_id, word in enumerate(self.words):
+            if WORD_RUN.fullmatch(word):
+                self.simple.setdefault(word, []).append(word_id)
+            else:
+                self.patterns.append((word_id, re.compile(r'\b' + re.escape(word) + r'\b')))
+
+    def scan(self, lines):
+        """Yield (line number, word ID) for each line a lexicon word appears on"""
+        for line_number, line in enumerate(lines, 1):
+            line = line.lower()
+            for run in set(WORD_RUN.findall(line)):
+                for word_id in self.simple.get(run, ()):
+                    yield line_number, word_id
+            for word_id, pattern in self.patterns:
+                if pattern.search(line):
+                    yield line_number, word_id
+
+
+def find_category_hits(lexicon_df, lines, categories):
+    """
+    Return a DataFrame of (line_number, category) hits for a lexicon table.
+
+    categories maps a display name to the lexicon column flagging it (value 1).
+    Each lexicon row contributes one hit per line its word appears on, so a
+    word listed on several rows is counted once per row.
+    """
+    matcher = LexiconMatcher(lexicon_df['Word'])
+    flags = {name: (lexicon_df[column] == 1).to_numpy() for name, column in categories.items()}
+
+    line_numbers, hit_categories = [], []
+    for line_number, word_id in matcher.scan(lines):
+        for name, flagged in flags.items():
+            if flagged[word_id]:
+                line_numbers.append(line_number)
+                hit_categories.append(name)
+
+    return pd.DataFrame({'line_number': line_numbers, 'category': hit_categories})
@@ -0,0 +1,166 @@
+# src/lexicon_registry.py
+"""
+Thematic lexicons from several models, normalized and matched to the token-stream
+vocabulary once, with each word's model membership stored as one bitmask per
+vocabulary ID. Overlaps between any set of models are bit tests over that array.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from spans import timed
+from spelling import normalize_orthography
+
+# Lexicon files per theme and model; a new model is one more entry per theme
+LEXICON_FILES = {
+    'Emotion': {
+        'ChatGPT': './from_full_text/chatgpt/emotion_words.csv',
+        'Claude': './from_full_text/claude/sggk-emotion-words.csv',
+        'Grok': './from_full_text/grok/emotion_words_sggk.csv',
+    },
+    'Religious': {
+        'ChatGPT': './from_full_text/chatgpt/religious_words.csv',
+        'Claude': './from_full_text/claude/sggk-religious-words.csv',
+        'Grok': './from_full_text/grok/religious_words_sggk.csv',
+    },
+}
+# Cells such as 'Kryst/Cryst/Crist' list several spellings of one entry
+VARIANT_SEPARATOR = re.compile(r'\s*/\s*')
+
+
+def split_variants(cell):
+    """Lowercase single-word spellings in a lexicon cell; multi-word phrases cannot match a token"""
+    if not isinstance(cell, str):
+        return []
+    return [v.lower() for v in VARIANT_SEPARATOR.split(cell.strip()) if v and ' ' not in v]
+
+
+def read_lexicon(source):
+    """Every spelling listed in the first column of a lexicon CSV (a path or file object)"""
+    df = pd.read_csv(source)
+    return [variant for cell in df.iloc[:, 0] for variant in split_variants(cell)]
+
+
+class LexiconCache:
+    """
+    Parsed lexicons shared by every session in the process. A file is re-read only when
+    its mtime or size changes, and re-parsed only when its SHA-1 changes too; stale
+    files are read concurrently in a thread pool.
+    """
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.entries = {}  # path -> (mtime_ns, size, sha1, spellings)
+        self.lock = threading.Lock()
+
+    def _refresh(self, path):
+        """Re-read one file whose stat changed, returning its cache entry"""
+        # Stat first: an edit landing mid-read then leaves an older stamp on newer bytes,
+        # which only costs one extra refresh, never a stale entry that looks current
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        sha1 = hashlib.sha1(data).hexdigest()
+        cached = self.entries.get(path)
+        if cached is not None and cached[2] == sha1:
+            spellings = cached[3]  # touched but unchanged
+        else:
+            spellings = read_lexicon(io.BytesIO(data))
+        return stat.st_mtime_ns, stat.st_size, sha1, spellings
+
+    def read(self, paths):
+        """Return {path: (sha1, spellings)} for the given files, refreshing stale ones concurrently"""
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            cached = self.entries.get(path)
+            if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                stale.append(path)
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(stale))) as pool:
+                refreshed = dict(zip(stale, pool.map(self._refresh, stale)))
+            with self.lock:
+                self.entries.update(refreshed)
+        return {path: self.entries[path][2:] for path in paths}
+
+
+LEXICON_CACHE = LexiconCache()
+
+
+def read_theme_lexicons(theme, cache=LEXICON_CACHE):
+    """
+    Return ({model: spellings}, version) for a theme, where version is the tuple of the
+    files' SHA-1s. Only the theme's own files are read, so a missing or broken file
+    of one theme does not affect the other.
+    """
+    files = LEXICON_FILES[theme]
+    entries = cache.read(list(files.values()))
+    lexicons = {model: entries[path][1] for model, path in files.items()}
+    return lexicons, tuple(entries[path][0] for path in files.values())
+
+
+class LexiconRegistry:
+    """
+    Model membership of every vocabulary word as a bitmask (bit i set for the i-th model).
+    A lexicon spelling matches every vocabulary word with the same normalized orthography,
+    so 'Blythe' finds 'blyþe' and 'Gawain' finds 'gawayn'. c and k are kept apart, so
+    'Crist' and 'Kryst' only both match when a lexicon lists both spellings.
+    """
+
+    @timed()
+    def __init__(self, vocab, lexicons):
+        self.models = list(lexicons)
+        self.vocab = vocab
+        dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64)
+                     if np.iinfo(t).bits >= len(self.models))
+        keys = {}
+        for word_id, word in enumerate(vocab):
+            keys.setdefault(normalize_orthography(word), []).append(word_id)
+        self.membership = np.zeros(len(vocab), dtype=dtype)
+        for bit, words in enumerate(lexicons.values()):
+            word_ids = [i for word in words for i in keys.get(normalize_orthography(word), [])]
+            self.membership[word_ids] |= dtype(1 << bit)
+
+    def bits(self, models):
+        """Bitmask with one bit set per named model"""
+        return sum(1 << self.models.index(model) for model in models)
+
+    def mask(self, model):
+        """Boolean mask over vocabulary IDs for one model's lexicon"""
+        return (self.membership & self.bits([model])) != 0
+
+    def words(self, model):
+        """Vocabulary words in one model's lexicon"""
+        return {self.vocab[i] for i in np.flatnonzero(self.mask(model))}
+
+    @timed()
+    def positions(self, stream):
+        """Normalized (0-1) token positions per model, from one gather over the token stream"""
+        token_bits = self.membership[stream.ids]
+        total_tokens = max(len(stream), 1)
+        return {model: np.flatnonzero(token_bits & self.bits([model])) / total_tokens
+                for model in self.models}
+
+    def overlap(self, models):
+        """Number of vocabulary words found by every one of the given models"""
+        wanted = self.bits(models)
+        return int(np.count_nonzero((self.membership & wanted) == wanted))
+
+    def upset_counts(self):
+        """
+        Words per exact combination of models (UpSet-style, each word counted once),
+        largest first, from a single bincount over the membership bitmasks.
+        """
+        counts = np.bincount(self.membership.astype(np.int64), minlength=1 << len(self.models))
+        rows = [{'Models': ' & '.join(m for i, m in enumerate(self.models) if pattern >> i & 1),
+                 'Number of models': bin(pattern).count('1'),
+                 'Words': int(count)}
+                for pattern, count in enumerate(counts) if pattern and count]
+        return pd.DataFrame(rows, columns=['Models', 'Number of models', 'Words']).sort_values(
+            'Words', ascending=False, ignore_index=True)
@@ -0,0 +1,39 @@
+# src/page_loader.py
+import importlib
+import sys
+import time
+
+# Process-wide record of what each first-time import and dataset load cost, in ms.
+# Later reruns hit sys.modules and the Streamlit caches, so only first calls count.
+STARTUP_TIMINGS = {}
+
+_process_start = time.perf_counter()
+
+
+def import_page_module(name):
+    """Import a page's module on first use, recording how long the import took"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP_TIMINGS.setdefault(f"import {name}", (time.perf_counter() - start) * 1000)
+    return module
+
+
+def load_dataset(label, loader, *args):
+    """Call a (cached) dataset loader, recording how long its first call took"""
+    start = time.perf_counter()
+    result = loader(*args)
+    STARTUP_TIMINGS.setdefault(f"load {label}", (time.perf_counter() - start) * 1000)
+    return result
+
+
+def mark(label):
+    """Record the time since this process started, e.g. when the first page finishes rendering"""
+    STARTUP_TIMINGS.setdefault(label, (time.perf_counter() - _process_start) * 1000)
+
+
+def startup_report():
+    """Return the recorded startup steps as (step, milliseconds) rows, in the order they happened"""
+    return [(step, round(ms, 1)) for step, ms in STARTUP_TIMINGS.items()]
@@ -0,0 +1,366 @@
+# src/query_api.py
+"""
+Headless JSON API over the same on-disk indexes the app reads (index/, the token
+stream and co-occurrence caches, the lexicon files), for notebooks and batch jobs.
+Responses carry an ETag and are cached server-side per data version, so a repeated
+request costs a dictionary lookup and If-None-Match gets a 304.
+
+    python query_api.py                       # http://127.0.0.1:8600
+    python query_api.py --host 0.0.0.0 --port 9000
+
+    GET /search?q=knyȝt&mode=contains|exact|variants|regex&start=0&limit=50&context=words:5
+    GET /positions?theme=Emotion              # per-model token positions (0-1)
+    GET /positions?word=gawayn                # positions of one word
+    GET /fitts                                # lexical diversity and Zipf/Heaps fits per fitt
+    GET /overlap?theme=Religious              # N-model overlap and UpSet counts
+    GET /collocates?word=drede&near=god&window=5&measure=pmi|log-likelihood
+    GET /metrics                              # span p50/p95 as Prometheus text (SGGK_TIMINGS=1)
+    GET /timings                              # the same as JSON
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import combinations
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from cooccurrence import MEASURES, open_cooccurrence
+from inverted_index import INDEX_DIR, SOURCE_TEXT, index_version, open_index
+from lexical_diversity import fitt_diversity
+from lexicon_registry import LEXICON_FILES, LexiconRegistry, read_theme_lexicons
+from spans import SPAN_STATS, begin_run, env_enabled, span
+from token_stream import FITT_END_MARKERS, fitt_boundaries, open_token_stream
+from word_laws import fitt_word_laws
+
+DEFAULT_PORT = 8600
+# Encoded responses kept in memory, in total bytes
+CACHE_BYTES = 64 * 1024 * 1024
+MAX_PAGE_SIZE = 1000
+# Widest context windows a search may ask for
+MAX_CONTEXT = {'words': 50, 'lines': 10}
+SEARCH_MODES = ('contains', 'exact', 'variants', 'regex')
+
+
+class BadRequest(Exception):
+    """A query parameter is missing or invalid"""
+
+
+class QueryService:
+    """
+    Answers API queries from one on-disk version of the index and text, loading derived
+    data lazily. LiveService swaps in a new one when the files change.
+    """
+
+    def __init__(self, text_path=SOURCE_TEXT, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.index = open_index(index_dir, text_path)
+        with open(text_path, 'r', encoding='utf-8') as f:
+            self.text = f.read().lower()
+        self.stream = open_token_stream(self.text, cache_dir=index_dir)
+        self.text_version = hashlib.sha1(self.text.encode('utf-8')).hexdigest()
+        self.fitt_ends = fitt_boundaries(self.text, self.stream)
+        self.derived = {}  # lazily built registries, co-occurrence matrices and fitt tables
+        self.lock = threading.Lock()
+
+    def _derived(self, key, build):
+        """Build a derived structure once, shared by all request threads"""
+        with self.lock:
+            if key not in self.derived:
+                self.derived[key] = build()
+            return self.derived[key]
+
+    def version(self, endpoint, params):
+        """Identifies the data a response is computed from; lexicon edits change it for theme queries"""
+        parts = [self.index.content_hash, self.text_version]
+        if endpoint in ('/positions', '/overlap') and 'theme' in params:
+            parts.extend(read_theme_lexicons(_theme(params))[1])
+        return hashlib.sha1('/'.join(parts).encode('utf-8')).hexdigest()
+
+    def registry(self, theme):
+        lexicons, version = read_theme_lexicons(theme)
+        return self._derived(('registry', theme, version), lambda: LexiconRegistry(self.stream.vocab, lexicons))
+
+    def search(self, params):
+        term = _required(params, 'q')
+        mode = params.get('mode', 'contains')
+        start = _int(params, 'start', 0, minimum=0)
+        limit = _int(params, 'limit', 50, minimum=1, maximum=MAX_PAGE_SIZE)
+        if mode == 'contains':
+            word_ids = self.index.match_words(term)
+        elif mode == 'exact':
+            word_ids = self.index.match_words(term, exact=True)
+        elif mode == 'variants':
+            word_ids = self.index.match_variants(term, _int(params, 'distance', 0, minimum=0, maximum=2))
+        elif mode == 'regex':
+            try:
+                word_ids = self.index.match_pattern(term)
+            except (re.error, TimeoutError) as e:
+                raise BadRequest(f"regex: {e}")
+        else:
+            raise BadRequest(f"mode must be one of {', '.join(SEARCH_MODES)}")
+        page = self.index.occurrences_page(word_ids, start, start + limit, _context(params.get('context')))
+        return {
+            'query': term,
+            'mode': mode,
+            'words': [self.index.vocab[i] for i in word_ids],
+            'total': self.index.occurrence_count(word_ids),
+            'start': start,
+            'rows': page.to_dict('records'),
+        }
+
+    def positions(self, params):
+        total_tokens = max(len(self.stream), 1)
+        result = {'fitt_ends': [end / total_tokens for end in self.fitt_ends]}
+        if 'word' in params:
+            word = _required(params, 'word').lower()
+            result['word'] = word
+            result['positions'] = self.stream.positions(self.stream.lexicon_mask([word]))
+        else:
+            theme = _theme(params)
+            result['theme'] = theme
+            result['models'] = self.registry(theme).positions(self.stream)
+        return result
+
+    def fitts(self, params):
+        def build():
+            ids = self.stream.ids
+            diversity = fitt_diversity(ids, self.fitt_ends)
+            laws = fitt_word_laws(ids, self.fitt_ends)
+            return diversity.merge(laws, on=['Section', 'Tokens', 'Types']).to_dict('records')
+        return {'markers': FITT_END_MARKERS, 'sections': self._derived(('fitts',), build)}
+
+    def overlap(self, params):
+        theme = _theme(params)
+        registry = self.registry(theme)
+        models = registry.models
+        return {
+            'theme': theme,
+            'models': models,
+            'words': {model: sorted(registry.words(model)) for model in models},
+            'overlaps': [{'models': list(group), 'words': registry.overlap(group)}
+                         for size in range(2, len(models) + 1) for group in combinations(models, size)],
+            'upset': registry.upset_counts().to_dict('records'),
+        }
+
+    def collocates(self, params):
+        word = _required(params, 'word')
+        measure = params.get('measure', 'pmi')
+        if measure not in MEASURES:
+            raise BadRequest(f"measure must be one of {', '.join(MEASURES)}")
+        same_line = params.get('scope') == 'line'
+        window = _int(params, 'window', 5, minimum=1, maximum=50)
+        # Same-line scope ignores window, so one matrix serves every window value
+        matrix = self._derived(
+            ('cooccurrence', same_line, None if same_line else window),
+            lambda: open_cooccurrence(self.text, self.stream, window, same_line, cache_dir=self.index_dir))
+        collocates = matrix.collocates(
+            word, measure=measure, min_count=_int(params, 'min_count', 1, minimum=1),
+            near=params.get('near') or None, top=_int(params, 'top', 25, minimum=1, maximum=MAX_PAGE_SIZE))
+        return {'word': word.lower(), 'measure': measure, 'collocates': collocates.to_dict('records')}
+
+
+class LiveService:
+    """The QueryService for the current index and text, reopened after a rebuild, reindex.py update or text edit"""
+
+    def __init__(self, text_path=SOURCE_TEXT, index_dir=INDEX_DIR):
+        self.text_path = text_path
+        self.index_dir = index_dir
+        self.loaded = None
+        self.service = None
+        self.lock = threading.Lock()
+
+    def files_version(self):
+        """meta.json's mtime (rewritten last by every build or update) and the text's (mtime, size)"""
+        try:
+            stat = os.stat(self.text_path)
+            text = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            text = None
+        return index_version(self.index_dir), text
+
+    def current(self):
+        """The service for the files as they are now; requests already running keep the one they started with"""
+        version = self.files_version()
+        with self.lock:
+            if version != self.loaded:
+                self.service = QueryService(self.text_path, self.index_dir)
+                # Opening may have built a missing index, so stat again
+                self.loaded = self.files_version() if version[0] is None else version
+            return self.service
+
+
+def _required(params, name):
+    value = params.get(name, '').strip()
+    if not value:
+        raise BadRequest(f"missing parameter '{name}'")
+    return value
+
+
+def _int(params, name, default, minimum=None, maximum=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise BadRequest(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        if maximum is None:
+            raise BadRequest(f"'{name}' must be at least {minimum}")
+        raise BadRequest(f"'{name}' must be between {minimum} and {maximum}")
+    if maximum is not None and value > maximum:
+        if minimum is None:
+            raise BadRequest(f"'{name}' must be at most {maximum}")
+        raise BadRequest(f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+
+def _theme(params):
+    theme = params.get('theme', '').capitalize()
+    if theme not in LEXICON_FILES:
+        raise BadRequest(f"theme must be one of {', '.join(LEXICON_FILES)}")
+    return theme
+
+
+def _context(value):
+    """Parse 'line', 'words:N' or 'lines:N' into a WordIndex context"""
+    if value in (None, '', 'line'):
+        return None
+    mode, _, width = value.partition(':')
+    if mode not in MAX_CONTEXT or not width.isdigit():
+        raise BadRequest("context must be 'line', 'words:N' or 'lines:N'")
+    if int(width) > MAX_CONTEXT[mode]:
+        raise BadRequest(f"context width for {mode} must be at most {MAX_CONTEXT[mode]}")
+    return mode, int(width)
+
+
+def _to_json(value):
+    """json.dumps fallback for numpy arrays and scalars"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ResponseCache:
+    """LRU of encoded (etag, body) responses keyed by request and data version, bounded by total body bytes"""
+
+    def __init__(self, maxbytes=CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return None
+
+    def put(self, key, value):
+        body_size = len(value[1])
+        if body_size > self.maxbytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[key] = value
+            self.size += body_size
+            while self.size > self.maxbytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[1])
+
+
+def make_handler(live, cache):
+    """Request handler class bound to a LiveService and response cache"""
+    endpoints = {
+        '/search': QueryService.search,
+        '/positions': QueryService.positions,
+        '/fitts': QueryService.fitts,
+        '/overlap': QueryService.overlap,
+        '/collocates': QueryService.collocates,
+    }
+
+    timing_exports = {
+        '/metrics': (SPAN_STATS.to_prometheus, 'text/plain; version=0.0.4; charset=utf-8'),
+        '/timings': (SPAN_STATS.to_json, 'application/json; charset=utf-8'),
+    }
+    timings_on = env_enabled()
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path in timing_exports:
+                export, content_type = timing_exports[url.path]
+                return self._send(200, export().encode('utf-8'), content_type=content_type)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            begin_run(timings_on)
+            endpoint = endpoints.get(url.path)
+            if endpoint is None:
+                return self._send(404, {'error': f"unknown endpoint {url.path}", 'endpoints': sorted(endpoints)})
+            try:
+                service = live.current()
+                key = (url.path, tuple(sorted(params.items())), service.version(url.path, params))
+                cached = cache.get(key)
+                if cached is None:
+                    with span(f"api {url.path}"):
+                        body = json.dumps(endpoint(service, params), default=_to_json, ensure_ascii=False).encode('utf-8')
+                    cached = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+                    cache.put(key, cached)
+            except BadRequest as e:
+                return self._send(400, {'error': str(e)})
+            except Exception as e:
+                # e.g. a missing or unreadable lexicon file; answer rather than drop the connection
+                self.log_error("%s failed: %r", self.path, e)
+                traceback.print_exc()
+                return self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            etag, body = cached
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self._send(200, body, etag)
+
+        def _send(self, status, payload, etag=None, content_type='application/json; charset=utf-8'):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+
+    return QueryHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve search, positions, fitt statistics and overlaps as JSON.")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument('--text', default=SOURCE_TEXT, help=f"source text (default: {SOURCE_TEXT})")
+    parser.add_argument('--index-dir', default=INDEX_DIR, help=f"index directory (default: {INDEX_DIR})")
+    args = parser.parse_args()
+
+    live = LiveService(args.text, args.index_dir)
+    # Open the index and text now rather than on the first request
+    live.current()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(live, ResponseCache()))
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# src/reindex.py
+"""
+Incremental re-indexing after an edit to the source text: update index/ for the
+changed lines only, then refresh the occurrence table derived from it. The app
+notices the new index on its next rerun and rebuilds its cached aggregates.
+
+    python reindex.py                         # full-sggk.txt -> index/ and word_occurrences.parquet
+    python reindex.py edited.txt --index-dir index --output word_occurrences.parquet
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from ingest import OCCURRENCES_FILE
+from inverted_index import INDEX_DIR, SOURCE_TEXT, WordIndex, update_index
+
+
+def occurrence_frame_from_index(index, document):
+    """The ingest occurrence table for a single text, expanded from its index"""
+    df = index.occurrence_table()
+    df['Word'] = df['Word'].astype(str)
+    df['Frequency'] = df['Frequency'].astype('int32')
+    df.insert(0, 'Document', pd.Categorical([document] * len(df), categories=[document]))
+    return df[['Document', 'Word', 'Frequency', 'Line Number', 'Byte Offset']]
+
+
+def reindex(text_path=SOURCE_TEXT, index_dir=INDEX_DIR, output=OCCURRENCES_FILE):
+    """
+    Update the index for text_path and rewrite the occurrence table when it was ingested
+    from that text alone. Returns (meta, changed line count, whether the table was written).
+    """
+    meta, changed = update_index(text_path, index_dir)
+    try:
+        documents = pd.read_parquet(output, columns=['Document'])['Document'].unique().tolist()
+    except FileNotFoundError:
+        documents = [text_path]
+    # A table ingested from several texts cannot be rebuilt from this one text's index;
+    # paths are compared resolved, so './full-sggk.txt' and 'full-sggk.txt' agree
+    if [os.path.abspath(str(document)) for document in documents] != [os.path.abspath(text_path)]:
+        return meta, changed, False
+    # Keep the Document label the table was ingested with
+    occurrence_frame_from_index(WordIndex(index_dir), str(documents[0])).to_parquet(output, index=False)
+    return meta, changed, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-index only the lines of a text that changed.")
+    parser.add_argument('text', nargs='?', default=SOURCE_TEXT, help=f"edited text (default: {SOURCE_TEXT})")
+    parser.add_argument('--index-dir', default=INDEX_DIR, help=f"index directory (default: {INDEX_DIR})")
+    parser.add_argument('-o', '--output', default=OCCURRENCES_FILE,
+                        help=f"occurrence table to refresh (default: {OCCURRENCES_FILE})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta, changed, refreshed = reindex(args.text, args.index_dir, args.output)
+    print(f"Re-indexed {changed:,} changed line(s): {meta['tokens']:,} tokens, {meta['vocabulary']:,} words, "
+          f"{meta['lines']:,} lines ({time.perf_counter() - start:.2f}s)")
+    if refreshed:
+        print(f"Refreshed {args.output}")
+    else:
+        print(f"{args.output} was ingested from several texts; re-run ingest.py to refresh it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# src/spans.py
+"""
+Span timing for the hot paths (data loading, search filtering, tokenization, chart
+building and Plotly/matplotlib rendering). Recording is off unless SGGK_TIMINGS is set
+or a run asks for it (the app's ?timings URL parameter). When on, each run's spans are
+kept for the sidebar breakdown, and the most recent durations of every span are kept
+process-wide for rolling p50/p95 export as JSON or Prometheus text.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TIMINGS_ENV = 'SGGK_TIMINGS'
+# Recent durations kept per span for the rolling percentiles
+ROLLING_WINDOW = 500
+QUANTILES = {0.5: 'p50_ms', 0.95: 'p95_ms'}
+
+# Each Streamlit session reruns on its own thread, as does each API request
+_run = threading.local()
+
+
+def env_enabled():
+    """Whether SGGK_TIMINGS turns timing on for every run"""
+    return os.environ.get(TIMINGS_ENV, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+
+class SpanStats:
+    """Rolling window of recent durations per span, shared by every thread in the process"""
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.durations = {}  # name -> deque of recent durations in ms
+        self.totals = {}  # name -> (calls, total ms) since the process started
+        self.lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self.lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.window)
+            self.durations[name].append(ms)
+            calls, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (calls + 1, total + ms)
+
+    def summary(self):
+        """One row per span: calls, total ms, and p50/p95/max over the rolling window"""
+        with self.lock:
+            snapshot = {name: sorted(values) for name, values in self.durations.items()}
+            totals = dict(self.totals)
+        rows = []
+        for name, values in sorted(snapshot.items()):
+            calls, total = totals[name]
+            rows.append({
+                'span': name,
+                'calls': calls,
+                'total_ms': round(total, 3),
+                **{key: round(percentile(values, q), 3) for q, key in QUANTILES.items()},
+                'max_ms': round(values[-1], 3),
+            })
+        return rows
+
+    def to_json(self):
+        return json.dumps({'window': self.window, 'spans': self.summary()}, indent=2)
+
+    def to_prometheus(self, prefix='sggk'):
+        """Prometheus text exposition: a summary metric in seconds, labelled by span"""
+        metric = f'{prefix}_span_duration_seconds'
+        lines = [f'# HELP {metric} Span durations; quantiles over the last {self.window} calls.',
+                 f'# TYPE {metric} summary']
+        for row in self.summary():
+            label = _label_value(row['span'])
+            for q, key in QUANTILES.items():
+                lines.append(f'{metric}{{span="{label}",quantile="{q}"}} {row[key] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {row["total_ms"] / 1000:.6f}')
+            lines.append(f'{metric}_count{{span="{label}"}} {row["calls"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label_value(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+SPAN_STATS = SpanStats()
+
+
+def begin_run(enabled):
+    """Start recording a new run (a rerun or an API request) on this thread, or stop recording"""
+    _run.enabled = enabled
+    _run.records = []
+    _run.depth = 0
+
+
+def run_spans():
+    """This run's spans as (depth, name, ms) rows in the order they started"""
+    return [tuple(record) for record in getattr(_run, 'records', []) if record[2] is not None]
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as one span of the current run; free when recording is off"""
+    if not getattr(_run, 'enabled', False):
+        yield
+        return
+    record = [_run.depth, name, None]
+    _run.records.append(record)
+    _run.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        record[2] = ms
+        _run.depth -= 1
+        SPAN_STATS.add(name, ms)
+
+
+def timed(name=None):
+    """Decorator form of span, named module.function (or module.Class.method) by default"""
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,97 @@
+# src/spelling.py
+import re
+import unicodedata
+
+# Letter equivalences of Middle English orthography, applied in order
+ORTHOGRAPHY_RULES = [
+    (re.compile(r'[þð]'), 'th'),
+    (re.compile(r'^[ȝ3]'), 'y'),      # initial yogh is a y sound: ȝe / ye
+    (re.compile(r'[ȝ3]'), 'gh'),      # elsewhere it is gh: knyȝt / knyght
+    (re.compile(r'y'), 'i'),          # y and i are interchangeable vowels
+    (re.compile(r'v'), 'u'),          # u and v are one letter
+    (re.compile(r'w(?![aeiouy])'), 'u'),  # w used as a vowel: fowle / foule
+]
+# Spelling keys also fold the variation that does not change the word
+SPELLING_RULES = ORTHOGRAPHY_RULES + [
+    (re.compile(r'(.)\1+'), r'\1'),   # doubled letters: blysse / blyse
+    (re.compile(r'z$'), 's'),         # plural/genitive -ez / -es
+    (re.compile(r'(?<=...)e$'), ''),  # unstressed final -e on longer words
+]
+# One edit is allowed per this many characters of the normalized query, so short
+# words like þe or ȝe do not fuzzy-match half the vocabulary
+CHARS_PER_EDIT = 3
+
+
+def _apply(rules, word):
+    """Lowercase a word, drop accents (pité / pite) and apply rewrite rules in order"""
+    key = ''.join(c for c in unicodedata.normalize('NFKD', word.lower()) if not unicodedata.combining(c))
+    for pattern, replacement in rules:
+        key = pattern.sub(replacement, key)
+    return key
+
+
+def normalize_orthography(word):
+    """Return a word with letter variants (þ/th, ȝ/gh/y, i/y, u/v/w) folded to one spelling"""
+    return _apply(ORTHOGRAPHY_RULES, word)
+
+
+def normalize_spelling(word):
+    """Return the canonical spelling key of a Middle English word"""
+    return _apply(SPELLING_RULES, word)
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 once it is certain to exceed it"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def _deletes(key, distance):
+    """Every string obtained by deleting up to distance characters from key"""
+    results = {key}
+    frontier = {key}
+    for _ in range(distance):
+        frontier = {s[:i] + s[i + 1:] for s in frontier for i in range(len(s))}
+        results |= frontier
+    return results
+
+
+class SpellingIndex:
+    """
+    Groups vocabulary words by canonical spelling key and finds keys within a bounded
+    edit distance of a query using symmetric deletes (SymSpell): every key is stored
+    under all its variants with up to max_distance characters deleted, so a lookup
+    only generates the query's own deletes and verifies the few candidates.
+    """
+
+    def __init__(self, vocab, max_distance=2):
+        self.max_distance = max_distance
+        self.key_words = {}
+        for word_id, word in enumerate(vocab):
+            self.key_words.setdefault(normalize_spelling(word), []).append(word_id)
+        self.deletes = {}
+        for key in self.key_words:
+            for variant in _deletes(key, max_distance):
+                self.deletes.setdefault(variant, set()).add(key)
+
+    def lookup(self, query, distance=1):
+        """Return sorted IDs of words whose spelling key is within distance edits of the query's"""
+        query_key = normalize_spelling(query)
+        distance = min(distance, self.max_distance, len(query_key) // CHARS_PER_EDIT)
+        candidates = set()
+        for variant in _deletes(query_key, distance):
+            candidates |= self.deletes.get(variant, set())
+        word_ids = []
+        for key in candidates:
+            if edit_distance(query_key, key, distance) <= distance:
+                word_ids.extend(self.key_words[key])
+        return sorted(word_ids)
@@ -1,17 +1,18 @@
 # src/stats_section.py
 import streamlit as st
 
-def display_stats_section(df):
+def display_stats_section(aggregates):
     """Display the statistics section of the app"""
-    # Calculate statistics
-    unique_words = df['Word'].nunique()
-    total_occurrences = len(df)
-    max_line = df['Line Number'].max()
-    min_line = df['Line Number'].min()
+    # Statistics are precomputed once per index in the aggregate store
+    summary = aggregates['summary']
+    unique_words = summary['unique_words']
+    total_occurrences = summary['total_occurrences']
+    max_line = summary['max_line']
+    min_line = summary['min_line']
     
     # Get word frequencies (unique words with their frequencies)
-    word_freq = df.drop_duplicates(subset=['Word'])[['Word', 'Frequency']].sort_values('Frequency', ascending=False)
-    most_frequent_word = word_freq.iloc[0]
+    word_freq = aggregates['word_freq']
+    most_frequent_word = {'Word': summary['most_frequent_word'], 'Frequency': summary['most_frequent_count']}
     
     # Info section
     st.info(f"""
@@ -0,0 +1,44 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from export import POSITION_COLUMNS, export_bytes
+
+
+def position_frame(models, words, tokens):
+    """A chunk shaped like position_chunks yields, empty when no token in the slice matched"""
+    tokens = np.asarray(tokens, dtype=np.int64)
+    return pd.DataFrame({
+        'Model': np.asarray(models, dtype=object),
+        'Word': np.asarray(words, dtype=object),
+        'Token': tokens,
+        'Position': tokens / 100,
+        'Line Number': tokens // 10 + 1,
+    }, columns=POSITION_COLUMNS)
+
+
+def chunks_with_leading_empty():
+    return [
+        position_frame([], [], []),
+        position_frame(['Religious', 'Chivalric'], ['god', 'knyȝt'], [12, 40]),
+        position_frame([], [], []),
+        position_frame(['Religious'], ['crist'], [95]),
+    ]
+
+
+def test_parquet_with_leading_empty_chunk():
+    data = export_bytes(chunks_with_leading_empty(), 'parquet', POSITION_COLUMNS)
+    df = pd.read_parquet(io.BytesIO(data))
+    assert list(df.columns) == POSITION_COLUMNS
+    assert df['Word'].tolist() == ['god', 'knyȝt', 'crist']
+    assert df['Token'].tolist() == [12, 40, 95]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_all_empty_chunks_keep_columns(fmt):
+    data = export_bytes([position_frame([], [], [])] * 2, fmt, POSITION_COLUMNS)
+    df = pd.read_parquet(io.BytesIO(data)) if fmt == 'parquet' else pd.read_csv(io.BytesIO(data))
+    assert list(df.columns) == POSITION_COLUMNS
+    assert df.empty
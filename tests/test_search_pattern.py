@@ -0,0 +1,48 @@
+import re
+import threading
+import time
+
+import pytest
+
+from inverted_index import PATTERN_TIME_BUDGET, WordIndex, build_index
+
+CATASTROPHIC_PATTERNS = [
+    r'(\w*)*(\w*)*(\w*)*(\w*)*(\w*)*(\w*)*Q',
+    r'(a|aa)*b',
+    r'(\w+)+Q',
+    r'\w*\w*\w*\w*\w*\w*\w*\w*Q',
+]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('pattern')
+    text = directory / 'text.txt'
+    text.write_text("Whiderwarde-so-euer he wende\nAlþer-grattest and aaaaaaaaaaaaaaaaaaaaaaaa\n", encoding='utf-8')
+    build_index(str(text), str(directory / 'index'))
+    return WordIndex(str(directory / 'index'))
+
+
+@pytest.mark.parametrize('pattern', CATASTROPHIC_PATTERNS)
+def test_catastrophic_pattern_is_bounded(index, pattern):
+    outcome = {}
+
+    def search():
+        try:
+            outcome['ids'] = index.match_pattern(pattern)
+        except (re.error, TimeoutError) as e:
+            outcome['error'] = e
+
+    start = time.perf_counter()
+    worker = threading.Thread(target=search, daemon=True)
+    worker.start()
+    worker.join(timeout=PATTERN_TIME_BUDGET + 2)
+    assert not worker.is_alive(), f"{pattern} is still running"
+    assert time.perf_counter() - start < PATTERN_TIME_BUDGET + 2
+    assert outcome
+
+
+def test_ordinary_patterns_still_match(index):
+    words = {index.vocab[i] for i in index.match_pattern(r'^wh[iy]der')}
+    assert words == {'whiderwarde-so-euer'}
+    assert {index.vocab[i] for i in index.match_pattern(r'(th|þ)')} >= {'alþer-grattest'}
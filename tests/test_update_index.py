@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import inverted_index
+from inverted_index import WordIndex, build_index, read_meta, update_index
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'full-sggk.txt')
+INDEX_FILES = ['offsets.npy', 'postings.npy', 'line_counts.npy', 'line_starts.npy', 'line_hashes.npy']
+
+
+def poem_lines(count=60):
+    with open(SOURCE, 'r', encoding='utf-8', newline='') as f:
+        return f.read().split('\n')[:count]
+
+
+def insert_lines(lines):
+    return lines[:5] + ["A new line of verse, with a neologysm", "ȝe, and anoþer"] + lines[5:]
+
+
+def delete_lines(lines):
+    return lines[:10] + lines[14:]
+
+
+def edit_lines(lines):
+    edited = list(lines)
+    edited[0] = "Siþen þe sege and þe assaut watz sesed at Troye, quod he"
+    edited[20] = edited[20].upper()
+    edited[-1] = ""
+    return edited
+
+
+def mixed_edits(lines):
+    # Repeated lines give the diff equal hashes to pair up
+    return edit_lines(delete_lines(insert_lines(lines))) + [lines[3], lines[3]]
+
+
+def write_text(path, lines):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def assert_same_index(updated_dir, built_dir):
+    for name in INDEX_FILES:
+        np.testing.assert_array_equal(np.load(os.path.join(updated_dir, name)),
+                                      np.load(os.path.join(built_dir, name)), err_msg=name)
+    for name in ['vocab.txt', inverted_index.SNAPSHOT_NAME]:
+        with open(os.path.join(updated_dir, name), 'rb') as a, open(os.path.join(built_dir, name), 'rb') as b:
+            assert a.read() == b.read(), name
+    updated, built = read_meta(updated_dir), read_meta(built_dir)
+    for meta in (updated, built):
+        meta.pop('generation')
+        meta.pop('source')
+    assert updated == built
+
+
+@pytest.mark.parametrize('edit', [insert_lines, delete_lines, edit_lines, mixed_edits])
+def test_update_matches_full_build(tmp_path, edit):
+    text = tmp_path / 'text.txt'
+    lines = poem_lines()
+    write_text(text, lines)
+    build_index(str(text), str(tmp_path / 'updated'))
+
+    write_text(text, edit(lines))
+    meta, changed = update_index(str(text), str(tmp_path / 'updated'))
+    build_index(str(text), str(tmp_path / 'built'))
+
+    # Only inserted or edited lines are tokenized again
+    assert changed < meta['lines'] == len(edit(lines))
+    assert_same_index(str(tmp_path / 'updated'), str(tmp_path / 'built'))
+    index = WordIndex(str(tmp_path / 'updated'))
+    assert index.concordance.line(1) == edit(lines)[0]
+
+
+def test_update_advances_even_generation(tmp_path):
+    text = tmp_path / 'text.txt'
+    write_text(text, poem_lines())
+    first = build_index(str(text), str(tmp_path / 'index'))
+    write_text(text, edit_lines(poem_lines()))
+    second, _ = update_index(str(text), str(tmp_path / 'index'))
+    assert first['generation'] % 2 == 0
+    assert second['generation'] == first['generation'] + 2
+
+
+def set_generation(index_dir, generation):
+    meta = read_meta(index_dir)
+    meta['generation'] = generation
+    # Replaced whole, as _write_index does, so the polling reader never sees a partial file
+    path = os.path.join(index_dir, 'meta.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+
+
+def test_open_waits_while_generation_is_odd(tmp_path):
+    text = tmp_path / 'text.txt'
+    write_text(text, poem_lines())
+    index_dir = str(tmp_path / 'index')
+    generation = build_index(str(text), index_dir)['generation']
+    set_generation(index_dir, generation + 1)
+
+    opened = {}
+
+    def open_index():
+        opened['index'] = WordIndex(index_dir)
+        opened['at'] = time.monotonic()
+
+    worker = threading.Thread(target=open_index, daemon=True)
+    worker.start()
+    time.sleep(0.3)
+    assert worker.is_alive()
+    finished = time.monotonic()
+    set_generation(index_dir, generation + 2)
+    worker.join(timeout=5)
+
+    assert not worker.is_alive()
+    assert opened['at'] >= finished
+    assert opened['index'].meta['generation'] == generation + 2
+
+
+def test_open_gives_up_on_a_stuck_write(tmp_path, monkeypatch):
+    text = tmp_path / 'text.txt'
+    write_text(text, poem_lines())
+    index_dir = str(tmp_path / 'index')
+    set_generation(index_dir, build_index(str(text), index_dir)['generation'] + 1)
+    monkeypatch.setattr(inverted_index, 'OPEN_TIMEOUT', 0.2)
+    with pytest.raises(RuntimeError):
+        WordIndex(index_dir)
+
+
+def test_update_without_manifest_builds(tmp_path):
+    text = tmp_path / 'text.txt'
+    write_text(text, poem_lines())
+    build_index(str(text), str(tmp_path / 'index'))
+    shutil.copytree(tmp_path / 'index', tmp_path / 'built')
+    os.remove(tmp_path / 'index' / 'line_hashes.npy')
+    meta, changed = update_index(str(text), str(tmp_path / 'index'))
+    assert changed == meta['lines']
+    assert_same_index(str(tmp_path / 'index'), str(tmp_path / 'built'))
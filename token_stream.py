@@ -0,0 +1,128 @@
+# src/token_stream.py
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from spans import timed
+
+# Tokenization used by the distribution plots (letters plus thorn and yogh only)
+TOKEN_PATTERN = re.compile(r"[a-zþȝ]+")
+# Last line of each of the poem's four fitts
+FITT_END_MARKERS = [
+    "Þat þou hatz tan on honde.",
+    "Cowþe wel halde layk alofte.",
+    "I schal telle yow how þay wroȝt.",
+    "HONY SOYT QUI MAL PENCE."
+]
+
+
+class TokenStream:
+    """A text encoded once as an int32 array of token IDs over a sorted vocabulary"""
+
+    def __init__(self, vocab, ids, starts):
+        self.vocab = vocab
+        self.word_to_id = {word: i for i, word in enumerate(vocab)}
+        self.ids = ids        # token ID of every token, in text order
+        self.starts = starts  # character offset of every token in the lowercased text
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lexicon_mask(self, words):
+        """Return a boolean mask over vocabulary IDs that is True for words in the lexicon"""
+        mask = np.zeros(len(self.vocab), dtype=bool)
+        word_ids = [self.word_to_id[w] for w in words if w in self.word_to_id]
+        mask[word_ids] = True
+        return mask
+
+    def positions(self, mask):
+        """Return the normalized (0-1) positions of all tokens whose ID is set in mask"""
+        if len(self.ids) == 0:
+            return np.empty(0)
+        return np.flatnonzero(mask[self.ids]) / len(self.ids)
+
+    def tokens_before(self, char_offset):
+        """Number of tokens that start before a character offset"""
+        return int(np.searchsorted(self.starts, char_offset))
+
+
+def fitt_boundaries(text, stream, markers=FITT_END_MARKERS):
+    """Token index where each fitt ends (after its last line), for the markers found in the lowercased text"""
+    boundaries = []
+    for marker in markers:
+        index = text.find(marker.lower())
+        if index != -1:
+            boundaries.append(stream.tokens_before(index + len(marker)))
+    return boundaries
+
+
+@timed()
+def encode_text(text):
+    """Tokenize lowercased text and encode it as a TokenStream"""
+    matches = list(TOKEN_PATTERN.finditer(text))
+    tokens = np.array([m.group() for m in matches], dtype=str)
+    starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    if len(tokens) == 0:
+        return TokenStream([], np.empty(0, dtype=np.int32), starts)
+    vocab, ids = np.unique(tokens, return_inverse=True)
+    return TokenStream(vocab.tolist(), ids.astype(np.int32), starts)
+
+
+def save_token_stream(stream, cache_dir, text):
+    """
+    Write a TokenStream as .npy arrays so later loads can memory-map it. Each file is
+    written to a temporary name and renamed over the old one, so streams that still
+    map the previous arrays keep reading the old files.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, 'token_meta.json')
+    # Drop the stamp first, so no one maps a mix of old and new arrays meanwhile
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    _replace(cache_dir, 'token_ids.npy', lambda f: np.save(f, stream.ids))
+    _replace(cache_dir, 'token_starts.npy', lambda f: np.save(f, stream.starts))
+    _replace(cache_dir, 'token_vocab.txt', lambda f: f.write('\n'.join(stream.vocab) + '\n'), 'w')
+    _replace(cache_dir, 'token_meta.json', lambda f: json.dump(_text_stamp(text), f, indent=2), 'w')
+
+
+def _replace(cache_dir, name, write, mode='wb'):
+    """Write one cache file via a temporary file and rename"""
+    path = os.path.join(cache_dir, name)
+    with open(path + '.tmp', mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        write(f)
+    os.replace(path + '.tmp', path)
+
+
+@timed()
+def open_token_stream(text, cache_dir=None):
+    """
+    Return the TokenStream for a text. With a cache_dir, the encoded arrays are
+    memory-mapped from disk when they were built from the same text, and
+    written there otherwise.
+    """
+    if cache_dir is None:
+        return encode_text(text)
+
+    meta_path = os.path.join(cache_dir, 'token_meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == _text_stamp(text):
+                with open(os.path.join(cache_dir, 'token_vocab.txt'), 'r', encoding='utf-8') as vf:
+                    vocab = vf.read().splitlines()
+                return TokenStream(
+                    vocab,
+                    np.load(os.path.join(cache_dir, 'token_ids.npy'), mmap_mode='r'),
+                    np.load(os.path.join(cache_dir, 'token_starts.npy'), mmap_mode='r'),
+                )
+
+    stream = encode_text(text)
+    save_token_stream(stream, cache_dir, text)
+    return stream
+
+
+def _text_stamp(text):
+    """Identify the text a cached stream was encoded from"""
+    return {'sha1': hashlib.sha1(text.encode('utf-8')).hexdigest(), 'length': len(text)}
@@ -2,17 +2,17 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-import pandas as pd
+from aggregates import line_group_means
+from data_loader import load_lexical_diversity, load_word_laws
+from spans import span
 
-def get_frequency_by_position_figure(df):
+def get_frequency_by_position_figure(line_sums, bin_width=100):
     """
     Generates the Plotly figure for Average Word Frequency by Line Position.
     This function is designed to return the figure object for reusability.
     """
-    # Group by line ranges (every 100 lines)
-    df['Line Group'] = (df['Line Number'] // 100) * 100
-    line_groups = df.groupby('Line Group')['Frequency'].mean().reset_index()
-    line_groups['Line Range'] = line_groups['Line Group'].apply(lambda x: f"{x}-{x+99}")
+    # Group by line ranges (every bin_width lines) using the precomputed prefix sums
+    line_groups = line_group_means(line_sums, bin_width)
 
     fig = px.line(
         line_groups,
@@ -36,7 +36,7 @@ def get_frequency_by_position_figure(df):
     )
     return fig
 
-def display_frequency_by_position(df):
+def display_frequency_by_position(line_sums):
     """Display the frequency by line position chart"""
     st.subheader("Average Word Frequency by Line Position")
     st.markdown("""
@@ -45,13 +45,20 @@ def display_frequency_by_position(df):
     thematic sections. Peaks could represent formulaic passages or repetitive elements
     common in medieval poetry.
     """)
-    fig = get_frequency_by_position_figure(df)
-    st.plotly_chart(fig, use_container_width=True)
+    bin_width = st.select_slider(
+        "Lines per group",
+        options=[10, 25, 50, 100, 250, 500],
+        value=100,
+        key="line_group_width"
+    )
+    fig = get_frequency_by_position_figure(line_sums, bin_width)
+    with span('plotly.frequency_by_position'):
+        st.plotly_chart(fig, use_container_width=True)
 
-def display_visualizations(df):
+def display_visualizations(line_sums, aggregates):
     """Display the visualization section of the app"""
-    # Get word frequencies
-    word_freq = df.drop_duplicates(subset=['Word'])[['Word', 'Frequency']].sort_values('Frequency', ascending=False)
+    # Get word frequencies (precomputed once per index)
+    word_freq = aggregates['word_freq']
 
     # Chart selection
     st.markdown("---")
@@ -68,7 +75,9 @@ def display_visualizations(df):
             "Frequency Distribution",
             "Word Frequency by Line Position",
             "Frequency Dot Plot", # Changed option back
-            "Frequency of Frequencies Plot"
+            "Frequency of Frequencies Plot",
+            "Lexical Diversity",
+            "Zipf and Heaps' Laws"
         ]
     )
 
@@ -76,13 +85,95 @@ def display_visualizations(df):
     if chart_type == "Top Words":
         display_top_words(word_freq)
     elif chart_type == "Frequency Distribution":
-        display_frequency_distribution(word_freq)
+        display_frequency_distribution(aggregates['range_counts'])
     elif chart_type == "Word Frequency by Line Position":
-        display_frequency_by_position(df)
+        display_frequency_by_position(line_sums)
     elif chart_type == "Frequency Dot Plot": # Changed function call back
         display_frequency_dot_plot(word_freq)
+    elif chart_type == "Lexical Diversity":
+        display_lexical_diversity()
+    elif chart_type == "Zipf and Heaps' Laws":
+        display_word_laws()
     else:
-        display_frequency_of_frequencies_plot(word_freq)
+        display_frequency_of_frequencies_plot(aggregates['freq_of_freq'])
+
+def display_word_laws():
+    """Display Zipf's law and Heaps' law fits, for the whole poem and per fitt"""
+    st.subheader("Zipf's and Heaps' Laws")
+    st.markdown("""
+    Zipf's law says a word's frequency falls as a power of its rank, f ∝ rank^-s; the left chart
+    plots frequency against rank on log scales with two fits of s (least squares on the logs, and
+    maximum likelihood). Heaps' law says vocabulary grows as a power of text length, V = K·n^β;
+    the right chart shows how many distinct words have appeared after each word of the poem.
+    """)
+    fitt_table, zipf, heaps = load_word_laws()
+    if fitt_table is None:
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=zipf['Rank'], y=zipf['Frequency'], mode='markers', name='Observed',
+                                 marker=dict(color='#00a86b', size=4)))
+        fig.add_trace(go.Scatter(x=zipf['Rank'], y=zipf['Log LS fit'], mode='lines', name='Log LS fit',
+                                 line=dict(color='#0868ac', dash='dash')))
+        fig.add_trace(go.Scatter(x=zipf['Rank'], y=zipf['MLE fit'], mode='lines', name='MLE fit',
+                                 line=dict(color='#e6550d', dash='dot')))
+        fig.update_layout(title="Rank-Frequency (Zipf)", xaxis_title="Rank", yaxis_title="Frequency",
+                          xaxis_type='log', yaxis_type='log')
+        with span('plotly.zipf'):
+            st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=heaps['Tokens'], y=heaps['Vocabulary'], mode='lines', name='Observed',
+                                 line=dict(color='#00a86b')))
+        fig.add_trace(go.Scatter(x=heaps['Tokens'], y=heaps['Fit'], mode='lines', name='Fit',
+                                 line=dict(color='#0868ac', dash='dash')))
+        fig.update_layout(title="Vocabulary Growth (Heaps)", xaxis_title="Words Read", yaxis_title="Distinct Words")
+        with span('plotly.heaps'):
+            st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        fitt_table.style.format({'Zipf s (MLE)': '{:.3f}', 'Zipf s (log LS)': '{:.3f}',
+                                 'Heaps K': '{:.2f}', 'Heaps β': '{:.3f}'}),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def display_lexical_diversity():
+    """Display per-fitt lexical diversity measures and a rolling type-token ratio curve"""
+    st.subheader("Lexical Diversity")
+    st.markdown("""
+    Lexical diversity measures how varied the vocabulary is. The plain type-token ratio (TTR)
+    falls as a text gets longer, so the table also gives length-robust measures: MATTR (average
+    TTR over 25-word windows), MTLD (average run of words before the TTR drops to 0.72) and
+    HD-D (expected share of distinct words in a random 42-word sample). The curve shows the TTR
+    of a window sliding through the poem, with dashed lines at the ends of the fitts.
+    """)
+    window = st.select_slider(
+        "Words per window",
+        options=[100, 250, 500, 1000, 2000],
+        value=500,
+        key="diversity_window"
+    )
+    fitt_table, curve = load_lexical_diversity(window=window)
+    if fitt_table is None:
+        return
+
+    fig = px.line(curve, x='Position', y='TTR', title=f"Type-Token Ratio over {window}-Word Windows")
+    fig.update_traces(line=dict(color='#00a86b'), hovertemplate='Position: %{x:.1%}<br>TTR: %{y:.3f}<extra></extra>')
+    fitt_ends = fitt_table['Tokens'].iloc[:-1].cumsum() / fitt_table['Tokens'].iloc[-1]
+    for position in fitt_ends.iloc[:-1]:
+        fig.add_vline(x=position, line_dash="dash", line_color="grey")
+    fig.update_layout(xaxis_title="Position in Text", yaxis_title="Type-Token Ratio", xaxis_tickformat='.0%')
+    with span('plotly.lexical_diversity'):
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        fitt_table.style.format({'TTR': '{:.3f}', 'MATTR': '{:.3f}', 'MTLD': '{:.1f}', 'HD-D': '{:.3f}'}),
+        use_container_width=True,
+        hide_index=True
+    )
 
 def display_top_words(word_freq):
     """Display the top words chart"""
@@ -114,9 +205,10 @@ def display_top_words(word_freq):
 
     fig.update_traces(texttemplate='%{text}', textposition='outside')
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.top_words'):
+        st.plotly_chart(fig, use_container_width=True)
 
-def display_frequency_distribution(word_freq):
+def display_frequency_distribution(range_counts):
     """Display the frequency distribution chart"""
     st.subheader("Word Frequency Distribution")
     st.markdown("""
@@ -126,24 +218,6 @@ def display_frequency_distribution(word_freq):
     account for most usage.
     """)
 
-    # Create frequency ranges
-    ranges = []
-
-    for _, row in word_freq.iterrows():
-        freq = row['Frequency']
-        if freq <= 5:
-            ranges.append('1-5')
-        elif freq <= 20:
-            ranges.append('6-20')
-        elif freq <= 50:
-            ranges.append('21-50')
-        elif freq <= 100:
-            ranges.append('51-100')
-        else:
-            ranges.append('100+')
-
-    range_counts = pd.Series(ranges).value_counts()
-
     fig = px.pie(
         values=range_counts.values,
         names=range_counts.index,
@@ -161,7 +235,8 @@ def display_frequency_distribution(word_freq):
         textfont_size=20
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.frequency_distribution'):
+        st.plotly_chart(fig, use_container_width=True)
 
 def display_frequency_dot_plot(word_freq): # Function name changed back
     """Display a dot plot of word frequencies""" # Docstring changed
@@ -187,9 +262,10 @@ def display_frequency_dot_plot(word_freq): # Function name changed back
         xaxis_title="" # Set x-axis title to empty as it's not a density plot
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.frequency_dot_plot'):
+        st.plotly_chart(fig, use_container_width=True)
 
-def display_frequency_of_frequencies_plot(word_freq):
+def display_frequency_of_frequencies_plot(freq_of_freq):
     """Display a plot showing the frequency of frequencies."""
     st.subheader("Frequency of Frequencies Plot")
     st.markdown("""
@@ -201,13 +277,6 @@ def display_frequency_of_frequencies_plot(word_freq):
     The X-axis is on a logarithmic base 2 scale to better show the wide range of counts.
     """)
 
-    # Calculate the frequency of each frequency
-    freq_of_freq = word_freq['Frequency'].value_counts().reset_index()
-    freq_of_freq.columns = ['Word Frequency', 'Count of Words with this Frequency']
-
-    # Sort by 'Word Frequency' for a clearer plot
-    freq_of_freq = freq_of_freq.sort_values('Word Frequency')
-
     fig = px.bar(
         freq_of_freq,
         x='Count of Words with this Frequency',
@@ -248,4 +317,5 @@ def display_frequency_of_frequencies_plot(word_freq):
 
     fig.update_traces(texttemplate='%{x}', textposition='outside')
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('plotly.frequency_of_frequencies'):
+        st.plotly_chart(fig, use_container_width=True)
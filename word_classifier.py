@@ -1,97 +1,158 @@
+import argparse
+import os
 import pandas as pd
 import re
 
-def classify_words(input_file, output_file):
-    """
-    Classify words in a CSV file as religious or emotion-related based on
-    the word itself and its contextual usage in the line content.
-    """
-    # Define classification keywords
-    religious_terms = [
-        'lord', 'christ', 'jesus', 'holy', 'sacred', 'divine', 'prayer', 'pray',
-        'blessing', 'bless', 'church', 'chapel', 'altar', 'mass', 'service', 'priest',
-        'monk', 'nun', 'saint', 'heaven', 'hell', 'soul', 'spirit', 'faith', 'believe',
-        'sin', 'virtue', 'grace', 'mercy', 'forgive', 'absolution', 'confession',
-        'penance', 'salvation', 'redemption', 'trinity', 'cross', 'crucifix', 'bible',
-        'scripture', 'gospel', 'sermon', 'hymn', 'psalm', 'miracle', 'resurrection',
-        'angel', 'devil', 'satan', 'demon', 'blessed', 'eternal', 'immortal',
-        'almighty', 'omnipotent', 'worship', 'adore', 'praise', 'glory', 'hallelujah',
-        'amen',
-        # Middle English religious terms (excluding god variants)
-        'absolucioun', 'auter', 'blessyng', 'lorde', 'cryst',
-        'crist', 'haly', 'kirke', 'kyrke', 'preest', 'masse', 'chirche'
-    ]
+# Define classification keywords
+RELIGIOUS_TERMS = [
+    'lord', 'christ', 'jesus', 'holy', 'sacred', 'divine', 'prayer', 'pray',
+    'blessing', 'bless', 'church', 'chapel', 'altar', 'mass', 'service', 'priest',
+    'monk', 'nun', 'saint', 'heaven', 'hell', 'soul', 'spirit', 'faith', 'believe',
+    'sin', 'virtue', 'grace', 'mercy', 'forgive', 'absolution', 'confession',
+    'penance', 'salvation', 'redemption', 'trinity', 'cross', 'crucifix', 'bible',
+    'scripture', 'gospel', 'sermon', 'hymn', 'psalm', 'miracle', 'resurrection',
+    'angel', 'devil', 'satan', 'demon', 'blessed', 'eternal', 'immortal',
+    'almighty', 'omnipotent', 'worship', 'adore', 'praise', 'glory', 'hallelujah',
+    'amen',
+    # Middle English religious terms (excluding god variants)
+    'absolucioun', 'auter', 'blessyng', 'lorde', 'cryst',
+    'crist', 'haly', 'kirke', 'kyrke', 'preest', 'masse', 'chirche'
+]
+
+EMOTION_TERMS = [
+    'joy', 'happy', 'happiness', 'glad', 'cheerful', 'delight', 'pleasure',
+    'bliss', 'elated', 'sad', 'sadness', 'sorrow', 'grief', 'melancholy',
+    'despair', 'misery', 'woe', 'lament', 'angry', 'anger', 'rage', 'fury',
+    'wrath', 'ire', 'mad', 'furious', 'livid', 'indignant', 'fear', 'afraid',
+    'scared', 'terror', 'horror', 'dread', 'anxiety', 'worry', 'panic',
+    'love', 'affection', 'adore', 'cherish', 'devotion', 'passion', 'romance',
+    'tender', 'hate', 'hatred', 'loathe', 'despise', 'detest', 'abhor',
+    'disgust', 'revulsion', 'hope', 'hopeful', 'optimism', 'confidence',
+    'trust', 'shame', 'embarrassment', 'guilt', 'remorse', 'regret',
+    'humiliation', 'pride', 'proud', 'arrogance', 'vanity', 'conceit',
+    'hubris', 'envy', 'jealous', 'jealousy', 'covet', 'resentment',
+    'bitter', 'bitterness', 'surprise', 'amazement', 'wonder', 'astonishment',
+    'shock', 'startled',
+    # Middle English emotional terms
+    'blis', 'blys', 'blysse', 'blysful', 'blyþe', 'wraþ', 'angre', 'sorwe',
+    'joye', 'glade', 'murþe', 'mirth', 'drede', 'fere', 'luf', 'lufe',
+    'hatrede'
+]
+
+GOD_FORMS = ["God", "Gode", "Goddez"]
+
+
+def is_capitalized_god_religious(word, line_content):
+    """Check if capitalized God/Gode/Goddez should be classified as religious"""
+    if pd.isna(word) or pd.isna(line_content):
+        return False
     
-    emotion_terms = [
-        'joy', 'happy', 'happiness', 'glad', 'cheerful', 'delight', 'pleasure',
-        'bliss', 'elated', 'sad', 'sadness', 'sorrow', 'grief', 'melancholy',
-        'despair', 'misery', 'woe', 'lament', 'angry', 'anger', 'rage', 'fury',
-        'wrath', 'ire', 'mad', 'furious', 'livid', 'indignant', 'fear', 'afraid',
-        'scared', 'terror', 'horror', 'dread', 'anxiety', 'worry', 'panic',
-        'love', 'affection', 'adore', 'cherish', 'devotion', 'passion', 'romance',
-        'tender', 'hate', 'hatred', 'loathe', 'despise', 'detest', 'abhor',
-        'disgust', 'revulsion', 'hope', 'hopeful', 'optimism', 'confidence',
-        'trust', 'shame', 'embarrassment', 'guilt', 'remorse', 'regret',
-        'humiliation', 'pride', 'proud', 'arrogance', 'vanity', 'conceit',
-        'hubris', 'envy', 'jealous', 'jealousy', 'covet', 'resentment',
-        'bitter', 'bitterness', 'surprise', 'amazement', 'wonder', 'astonishment',
-        'shock', 'startled',
-        # Middle English emotional terms
-        'blis', 'blys', 'blysse', 'blysful', 'blyþe', 'wraþ', 'angre', 'sorwe',
-        'joye', 'glade', 'murþe', 'mirth', 'drede', 'fere', 'luf', 'lufe',
-        'hatrede'
-    ]
+    word_str = str(word)
+    content_str = str(line_content)
     
-    def is_capitalized_god_religious(word, line_content):
-        """Check if capitalized God/Gode/Goddez should be classified as religious"""
-        if pd.isna(word) or pd.isna(line_content):
-            return False
+    if word_str in GOD_FORMS:
+        pattern = GOD_PATTERNS[word_str]
+        matches = list(pattern.finditer(content_str))
         
-        word_str = str(word)
-        content_str = str(line_content)
-        
-        if word_str in ["God", "Gode", "Goddez"]:
-            pattern = r'\b' + re.escape(word_str) + r'\b'
-            matches = list(re.finditer(pattern, content_str))
-            
-            for match in matches:
-                start_pos = match.start()
-                if start_pos == 0:
-                    continue  # very beginning of text
-                preceding_text = content_str[:start_pos]
-                # Check if the match is preceded by sentence-ending punctuation
-                if re.search(r'[.!?]\s*$', preceding_text.strip()):
-                    continue  # after sentence end
-                return True  # it's not sentence-initial, so it's religious
-        return False
+        for match in matches:
+            start_pos = match.start()
+            if start_pos == 0:
+                continue  # very beginning of text
+            preceding_text = content_str[:start_pos]
+            # Check if the match is preceded by sentence-ending punctuation
+            if re.search(r'[.!?]\s*$', preceding_text.strip()):
+                continue  # after sentence end
+            return True  # it's not sentence-initial, so it's religious
+    return False
+
+
+def compile_terms(terms):
+    """Compile a term list into one regex that matches wherever any term is a substring"""
+    # Longest first, so shared prefixes don't shadow longer terms
+    return re.compile('|'.join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True)))
 
-    def is_religious(word, line_content):
-        if pd.isna(word) or pd.isna(line_content):
-            return False
-        if is_capitalized_god_religious(word, line_content):
-            return True
-        word_lower = str(word).lower()
-        content_lower = str(line_content).lower()
-        return any(term in word_lower or term in content_lower for term in religious_terms)
-
-    def is_emotional(word, line_content):
-        if pd.isna(word) or pd.isna(line_content):
-            return False
-        if is_capitalized_god_religious(word, line_content):
-            return False
-        word_lower = str(word).lower()
-        content_lower = str(line_content).lower()
-        return any(term in word_lower or term in content_lower for term in emotion_terms)
 
+GOD_PATTERNS = {form: re.compile(r'\b' + re.escape(form) + r'\b') for form in GOD_FORMS}
+RELIGIOUS_PATTERN = compile_terms(RELIGIOUS_TERMS)
+EMOTION_PATTERN = compile_terms(EMOTION_TERMS)
+
+
+def classify_frame(df):
+    """
+    Classify a whole Word / Line Content table at once.
+    Returns boolean Series (religious, emotional) aligned with df.
+
+    A row is religious if it is a non-sentence-initial God/Gode/Goddez, or if any
+    religious term occurs in the word or its line; it is emotional if any emotion
+    term occurs and it is not such a God row. Rows missing either column are neither.
+    """
+    valid = df['Word'].notna() & df['Line Content'].notna()
+    word_lower = df['Word'].astype(str).str.lower()
+    content_lower = df['Line Content'].astype(str).str.lower()
+
+    # Only the handful of God/Gode/Goddez rows need the per-row sentence check
+    god_rows = valid & df['Word'].astype(str).isin(GOD_FORMS)
+    god_religious = pd.Series(False, index=df.index)
+    if god_rows.any():
+        god_religious[god_rows] = [
+            is_capitalized_god_religious(word, content)
+            for word, content in zip(df.loc[god_rows, 'Word'], df.loc[god_rows, 'Line Content'])
+        ]
+
+    religious = valid & (god_religious
+                         | word_lower.str.contains(RELIGIOUS_PATTERN, na=False)
+                         | content_lower.str.contains(RELIGIOUS_PATTERN, na=False))
+    emotional = valid & ~god_religious & (word_lower.str.contains(EMOTION_PATTERN, na=False)
+                                          | content_lower.str.contains(EMOTION_PATTERN, na=False))
+    return religious, emotional
+
+
+def reuse_previous_classification(df, output_file):
+    """
+    Copy Religious / Emotion-Related from a previous output for rows whose
+    Word and Line Content are unchanged. Returns a mask of rows still to classify.
+    """
+    keys = ['Word', 'Line Content']
+    previous = pd.read_csv(output_file, encoding='utf-8')
+    if not set(keys + ['Religious', 'Emotion-Related']).issubset(previous.columns):
+        return pd.Series(True, index=df.index)
+
+    previous = previous[keys + ['Religious', 'Emotion-Related']].drop_duplicates(subset=keys)
+    merged = df[keys].merge(previous, how='left', on=keys)
+    df['Religious'] = merged['Religious'].to_numpy()
+    df['Emotion-Related'] = merged['Emotion-Related'].to_numpy()
+    return pd.Series(merged['Religious'].isna().to_numpy() | merged['Emotion-Related'].isna().to_numpy(),
+                     index=df.index)
+
+
+def classify_words(input_file, output_file, incremental=False):
+    """
+    Classify words in a CSV file as religious or emotion-related based on
+    the word itself and its contextual usage in the line content.
+
+    With incremental=True, rows whose Word and Line Content already appear in
+    an existing output_file keep their previous classification and only new or
+    edited rows are classified.
+    """
     try:
         print(f"Reading {input_file}...")
         df = pd.read_csv(input_file, encoding='utf-8')
         df = df.dropna(axis=1, how='all')
         print(f"Loaded {len(df)} rows with columns: {list(df.columns)}")
 
-        print("Classifying words...")
-        df['Religious'] = df.apply(lambda row: 'Yes' if is_religious(row['Word'], row['Line Content']) else 'No', axis=1)
-        df['Emotion-Related'] = df.apply(lambda row: 'Yes' if is_emotional(row['Word'], row['Line Content']) else 'No', axis=1)
+        if incremental and os.path.exists(output_file):
+            pending = reuse_previous_classification(df, output_file)
+            print(f"Reusing {int((~pending).sum())} unchanged rows from {output_file}")
+        else:
+            pending = pd.Series(True, index=df.index)
+
+        print(f"Classifying {int(pending.sum())} rows...")
+        religious, emotional = classify_frame(df[pending])
+        if pending.all():
+            df['Religious'] = 'No'
+            df['Emotion-Related'] = 'No'
+        df.loc[pending, 'Religious'] = religious.map({True: 'Yes', False: 'No'})
+        df.loc[pending, 'Emotion-Related'] = emotional.map({True: 'Yes', False: 'No'})
 
         total_words = len(df)
         religious_count = len(df[df['Religious'] == 'Yes'])
@@ -136,9 +197,13 @@ def classify_words(input_file, output_file):
 
 # Main execution
 if __name__ == "__main__":
-    input_filename = "target_word_data_sel.csv"
-    output_filename = "target_word_data_classified.csv"
-    result_df = classify_words(input_filename, output_filename)
+    parser = argparse.ArgumentParser(description="Classify words as religious or emotion-related.")
+    parser.add_argument('input', nargs='?', default="target_word_data_sel.csv")
+    parser.add_argument('output', nargs='?', default="target_word_data_classified.csv")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only classify rows whose word or line changed since the last output")
+    args = parser.parse_args()
+    result_df = classify_words(args.input, args.output, incremental=args.incremental)
     if result_df is not None:
         print(f"\nFirst few rows of the classified data:")
         print(result_df[['Word', 'Line Content', 'Religious', 'Emotion-Related']].head(10))
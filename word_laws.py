@@ -0,0 +1,127 @@
+# src/word_laws.py
+"""
+Zipf's and Heaps' law fits over a token-ID array (see token_stream.TokenStream),
+for the whole poem and per fitt. Everything is linear in the number of tokens
+apart from the sorts inside np.unique.
+"""
+import numpy as np
+import pandas as pd
+
+# Heaps curves are sampled at this many log-spaced token counts for fitting and plotting
+HEAPS_POINTS = 200
+# Heaps' law describes growth once a text is under way; the first few hundred tokens,
+# where nearly every word is new, are left out of the fit (but kept in the curve)
+HEAPS_MIN_TOKENS = 500
+
+
+def rank_frequencies(ids):
+    """Word frequencies sorted from most to least frequent (rank 1 first)"""
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.sort(np.bincount(ids)[np.unique(ids)])[::-1]
+
+
+def fit_zipf_least_squares(frequencies):
+    """Fit log f = log C - s log r by least squares; returns (s, C)"""
+    if len(frequencies) < 2:
+        return float('nan'), float('nan')
+    ranks = np.arange(1, len(frequencies) + 1)
+    slope, intercept = np.polyfit(np.log(ranks), np.log(frequencies), 1)
+    return float(-slope), float(np.exp(intercept))
+
+
+def fit_zipf_mle(frequencies, low=0.1, high=4.0, tol=1e-6):
+    """
+    Maximum-likelihood Zipf exponent s for p(r) = r^-s / H(V, s) over ranks 1..V.
+    The log-likelihood is concave in s, so its derivative is bisected to the root.
+    """
+    if len(frequencies) < 2:
+        return float('nan')
+    log_ranks = np.log(np.arange(1, len(frequencies) + 1))
+    total = frequencies.sum()
+    weighted = (frequencies * log_ranks).sum()
+
+    def slope(s):
+        # d/ds of -s * sum(f log r) - N log H(V, s)
+        weights = np.exp(-s * log_ranks)
+        return -weighted + total * (weights * log_ranks).sum() / weights.sum()
+
+    if slope(low) < 0:
+        return low
+    if slope(high) > 0:
+        return high
+    while high - low > tol:
+        mid = (low + high) / 2
+        if slope(mid) > 0:
+            low = mid
+        else:
+            high = mid
+    return float((low + high) / 2)
+
+
+def heaps_curve(ids):
+    """
+    Vocabulary size after each token, in one vectorized pass: a token adds a new
+    type exactly when it is the first occurrence of its ID.
+    """
+    first = np.zeros(len(ids), dtype=np.int64)
+    if len(ids):
+        _, first_index = np.unique(ids, return_index=True)
+        first[first_index] = 1
+    return np.cumsum(first)
+
+
+def fit_heaps(curve, points=HEAPS_POINTS, min_tokens=HEAPS_MIN_TOKENS):
+    """Fit V(n) = K n^beta by least squares in log space on log-spaced samples; returns (K, beta, n, V)"""
+    if len(curve) < 2:
+        return float('nan'), float('nan'), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    n = np.unique(np.geomspace(1, len(curve), points).astype(np.int64))
+    vocabulary = curve[n - 1]
+    fitted = n >= min(min_tokens, len(curve) // 10)
+    beta, log_k = np.polyfit(np.log(n[fitted]), np.log(vocabulary[fitted]), 1)
+    return float(np.exp(log_k)), float(beta), n, vocabulary
+
+
+def word_law_fits(ids):
+    """Zipf and Heaps fits for one stretch of text, as a dict"""
+    frequencies = rank_frequencies(ids)
+    zipf_s, _ = fit_zipf_least_squares(frequencies)
+    heaps_k, heaps_beta, _, _ = fit_heaps(heaps_curve(ids))
+    return {
+        'Tokens': len(ids),
+        'Types': len(frequencies),
+        'Zipf s (MLE)': fit_zipf_mle(frequencies),
+        'Zipf s (log LS)': zipf_s,
+        'Heaps K': heaps_k,
+        'Heaps β': heaps_beta,
+    }
+
+
+def fitt_word_laws(ids, boundaries):
+    """One row of fits per fitt plus one for the whole poem; boundaries are fitt-end token indices"""
+    rows = []
+    start = 0
+    for fitt, end in enumerate(boundaries, 1):
+        rows.append({'Section': f'Fitt {fitt}', **word_law_fits(ids[start:end])})
+        start = end
+    rows.append({'Section': 'Whole poem', **word_law_fits(ids)})
+    return pd.DataFrame(rows)
+
+
+def word_law_curves(ids):
+    """Rank-frequency and vocabulary-growth data for plotting, with the fitted values alongside"""
+    frequencies = rank_frequencies(ids)
+    ranks = np.arange(1, len(frequencies) + 1)
+    zipf_s, zipf_c = fit_zipf_least_squares(frequencies)
+    zipf_mle = fit_zipf_mle(frequencies)
+    # The MLE curve is scaled so its expected counts sum to the number of tokens
+    mle_weights = ranks ** -zipf_mle if len(ranks) else ranks
+    zipf = pd.DataFrame({
+        'Rank': ranks,
+        'Frequency': frequencies,
+        'Log LS fit': zipf_c * ranks ** -zipf_s if len(ranks) else ranks,
+        'MLE fit': frequencies.sum() * mle_weights / mle_weights.sum() if len(ranks) else ranks,
+    })
+    heaps_k, heaps_beta, n, vocabulary = fit_heaps(heaps_curve(ids))
+    heaps = pd.DataFrame({'Tokens': n, 'Vocabulary': vocabulary, 'Fit': heaps_k * n ** heaps_beta})
+    return zipf, heaps
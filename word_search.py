@@ -1,8 +1,22 @@
 # word_search.py
 import streamlit as st
 import re
+from export import EXPORT_FORMATS, export_bytes, frame_chunks
+from spans import span
 
-def display_word_search(df_main, df_target):
+# Context windows for main-text results: (mode, width) as taken by WordIndex.context
+CONTEXT_OPTIONS = {
+    "Line": None,
+    "±5 words": ('words', 5),
+    "±10 words": ('words', 10),
+    "±1 line": ('lines', 1),
+    "±2 lines": ('lines', 2),
+}
+SEARCH_MODES = ["Exact / contains", "Spelling variants", "Regular expression"]
+# Matched words listed under a spelling-variant or regular expression search
+MAX_VARIANTS_SHOWN = 40
+
+def display_word_search(index, df_target):
     """Display the word search section"""
     st.markdown("---")
     st.subheader("🔍 Search Words in the Text")
@@ -10,6 +24,11 @@ def display_word_search(df_main, df_target):
     Search for specific Middle English words to see where they appear in the text. 
     - Use quotes ("") for exact word matches only
     - Without quotes, search finds all words containing your search term
+    - In the main text, "Spelling variants" mode finds every spelling of a word: þ/th, ȝ/gh/y, 
+      i/y, u/v/w, doubled letters and final -e are treated as the same, and a spelling tolerance 
+      allows a few further letter changes
+    - "Regular expression" mode matches a pattern against each distinct word, e.g. `^bl[iy]s` 
+      for words starting bli- or bly-s
     
     Note that Middle English spelling can be variable - try different spellings if you don't find what 
     you're looking for. The special characters þ (thorn) and ȝ (yogh) are preserved from the 
@@ -25,7 +44,7 @@ def display_word_search(df_main, df_target):
     )
 
     if search_data_source == "All words (from main text)":
-        df_to_search = df_main
+        df_to_search = None # Main text is searched through the word index
         data_source_name = "main text"
     else:
         df_to_search = df_target
@@ -45,34 +64,97 @@ def display_word_search(df_main, df_target):
         st.session_state[session_key_prefix + 'page_size'] = 50 # Default page size
 
     search_term = st.text_input(f"Search for a Middle English word in {data_source_name}...", "", key=f"{session_key_prefix}search_input")
+
+    # Context windows are sliced from the text on demand, so wider views cost nothing extra
+    context = None
+    search_mode = SEARCH_MODES[0]
+    tolerance = None
+    if df_to_search is None:
+        search_mode = st.radio(
+            "Search mode:",
+            SEARCH_MODES,
+            index=0,
+            horizontal=True,
+            key=f"{session_key_prefix}mode_radio"
+        )
+        if search_mode == "Spelling variants":
+            tolerance = st.select_slider(
+                "Spelling tolerance (extra letter edits):",
+                options=[0, 1, 2],
+                value=0,
+                key=f"{session_key_prefix}tolerance_slider"
+            )
+        context_label = st.selectbox(
+            "Context shown:",
+            list(CONTEXT_OPTIONS),
+            index=0,
+            key=f"{session_key_prefix}context_selector"
+        )
+        context = CONTEXT_OPTIONS[context_label]
     
-    # Reset page if search term changed or source changed
-    if search_term != st.session_state[session_key_prefix + 'last_search']:
+    # Reset page if the search term, mode or spelling tolerance changed
+    search_key = (search_term, search_mode, tolerance)
+    if search_key != st.session_state[session_key_prefix + 'last_search']:
         st.session_state[session_key_prefix + 'page'] = 1
-        st.session_state[session_key_prefix + 'last_search'] = search_term
+        st.session_state[session_key_prefix + 'last_search'] = search_key
     
     if search_term:
+        if search_mode == "Spelling variants":
+            variant_term = search_term.strip('"')
+            word_ids = index.match_variants(variant_term, tolerance)
+            search_type = f"spelling variants of '{variant_term}'"
+        elif search_mode == "Regular expression":
+            try:
+                word_ids = index.match_pattern(search_term)
+            except re.error as e:
+                st.error(f"Invalid regular expression: {e}")
+                return
+            except TimeoutError as e:
+                st.error(f"Search stopped: {e}. Try a simpler pattern.")
+                return
+            search_type = f"words matching /{search_term}/"
         # Check if the search term is enclosed in quotes for exact match
-        if search_term.startswith('"') and search_term.endswith('"') and len(search_term) >= 1:
+        elif search_term.startswith('"') and search_term.endswith('"') and len(search_term) >= 1:
             # Extract the exact word to search (remove quotes)
             exact_word = search_term[1:-1]
             # Search for exact match (case-insensitive)
-            filtered_df = df_to_search[df_to_search['Word'].str.lower() == exact_word.lower()]
+            if df_to_search is None:
+                word_ids = index.match_words(exact_word, exact=True)
+            else:
+                with span('word_search.filter_target_words'):
+                    filtered_df = df_to_search[df_to_search['Word'].str.lower() == exact_word.lower()]
             search_type = f"exact match '{exact_word}'"
         else:
             # Search for partial matches (contains)
-            filtered_df = df_to_search[df_to_search['Word'].str.contains(search_term, case=False, na=False)]
+            if df_to_search is None:
+                word_ids = index.match_words(search_term)
+            else:
+                with span('word_search.filter_target_words'):
+                    filtered_df = df_to_search[df_to_search['Word'].str.contains(search_term, case=False, na=False)]
             search_type = f"words containing '{search_term}'"
         
-        if not filtered_df.empty:
-            st.write(f"Found {len(filtered_df)} occurrences of {search_type} in {data_source_name}:")
+        # Main-text results are counted and paged inside the index, so only
+        # the visible page is ever turned into a DataFrame
+        if df_to_search is None:
+            total_rows = index.occurrence_count(word_ids)
+        else:
+            total_rows = len(filtered_df)
+
+        if total_rows > 0:
+            st.write(f"Found {total_rows} occurrences of {search_type} in {data_source_name}:")
+            if search_mode != SEARCH_MODES[0]:
+                variants = [index.vocab[i] for i in word_ids]
+                shown = ", ".join(variants[:MAX_VARIANTS_SHOWN])
+                more = f" and {len(variants) - MAX_VARIANTS_SHOWN} more" if len(variants) > MAX_VARIANTS_SHOWN else ""
+                st.caption(f"Words matched: {shown}{more}")
             
             st.markdown("##### Occurrences in text:")
             
             # Pagination settings
             page_size = st.session_state[f'{session_key_prefix}page_size']
-            total_rows = len(filtered_df)
             total_pages = (total_rows + page_size - 1) // page_size
+            # A page size change or a reloaded text can leave the stored page past the end
+            st.session_state[session_key_prefix + 'page'] = min(max(st.session_state[session_key_prefix + 'page'], 1), total_pages)
             
             # Create columns for pagination controls
             col1, col2, col3, col4, col5 = st.columns([1, 1, 2, 1, 1])
@@ -112,13 +194,16 @@ def display_word_search(df_main, df_target):
             if search_data_source == "Specific target words" and 'Meaning Category' in filtered_df.columns:
                 columns_to_display.append('Meaning Category')
 
-            display_df = filtered_df.iloc[start_idx:end_idx][columns_to_display]
+            if df_to_search is None:
+                display_df = index.occurrences_page(word_ids, start_idx, end_idx, context)[columns_to_display]
+            else:
+                display_df = filtered_df.iloc[start_idx:end_idx][columns_to_display]
             
             column_configs = {
                 "Word": st.column_config.TextColumn("Word", width=100),
                 "Frequency": st.column_config.NumberColumn("Frequency", width=100),
                 "Line Number": st.column_config.NumberColumn("Line Number", width=100),
-                "Line Content": st.column_config.TextColumn("Line Content", width=500)
+                "Line Content": st.column_config.TextColumn("Line Content" if context is None else "Context", width=500)
             }
             if 'Meaning Category' in columns_to_display:
                 column_configs["Meaning Category"] = st.column_config.TextColumn("Meaning Category", width=150)
@@ -146,5 +231,24 @@ def display_word_search(df_main, df_target):
                     st.session_state[f'{session_key_prefix}page_size'] = new_page_size
                     st.session_state[session_key_prefix + 'page'] = 1 # Reset page on size change
                     st.rerun() # Rerun to apply new page size immediately
+
+            # Every match, not just this page: main-text rows are expanded from the index a
+            # chunk at a time and written to a temporary file only when the button is clicked
+            with st.expander(f"⬇ Export all {total_rows:,} occurrences"):
+                export_format = st.radio("Format:", list(EXPORT_FORMATS), horizontal=True, key=f"{session_key_prefix}export_format")
+                extension, mime = EXPORT_FORMATS[export_format]
+                if df_to_search is None:
+                    chunks = lambda: index.occurrence_chunks(word_ids, context)
+                else:
+                    chunks = lambda: frame_chunks(filtered_df[columns_to_display])
+                file_stem = re.sub(r'\W+', '_', search_term).strip('_') or 'results'
+                st.download_button(
+                    f"Download {export_format}",
+                    lambda: export_bytes(chunks(), extension, columns_to_display),
+                    file_name=f"search-{file_stem}.{extension}",
+                    mime=mime,
+                    on_click="ignore",
+                    key=f"{session_key_prefix}export_btn"
+                )
         else:
             st.warning(f"No {search_type} found in {data_source_name}")
\ No newline at end of file